@@ -16,9 +16,104 @@ class DB:
     name = Environment.get_string("DB_NAME", "cartdb")
     user = Environment.get_string("DB_USER", "cartdb_user")
     pass_ = Environment.get_string("DB_PASS", "zxcvbnml")
+    # optional read replica of the same database , read only endpoints are served from it when the host is set
+    replica_host = Environment.get_string("DB_REPLICA_HOST", "")
+    replica_port = Environment.get_string("DB_REPLICA_PORT", port)
+    # connection pool settings , these are per worker process
+    pool_size = Environment.get_int("DB_POOL_SIZE", 10)
+    pool_max_overflow = Environment.get_int("DB_POOL_MAX_OVERFLOW", 10)
+    pool_timeout_seconds = Environment.get_float("DB_POOL_TIMEOUT_SECONDS", 30)
+    pool_recycle_seconds = Environment.get_int("DB_POOL_RECYCLE_SECONDS", 1800)
+    pool_pre_ping = Environment.get_bool("DB_POOL_PRE_PING", True)
+    pool_use_lifo = Environment.get_bool("DB_POOL_USE_LIFO", True)
+    # apply pending schema migrations from scripts/migrations when the app starts
+    run_migrations_on_startup = Environment.get_bool("DB_RUN_MIGRATIONS_ON_STARTUP", True)
+    # requests running more statements than this are logged as a warning , 0 disables the check
+    query_budget_per_request = Environment.get_int("DB_QUERY_BUDGET_PER_REQUEST", 0)
+    # the LISTEN connection of every worker is checked this often , and reconnected after this delay when lost
+    notify_listener_check_seconds = Environment.get_float("DB_NOTIFY_LISTENER_CHECK_SECONDS", 30)
+    notify_listener_retry_seconds = Environment.get_float("DB_NOTIFY_LISTENER_RETRY_SECONDS", 5)
 
 
 class JWTToken:
     algorithm = Environment.get_string("JWT_ALGORITHM", "HS256")
     secret = Environment.get_string("JWT_SECRET", "secret")
-    access_token_expire_minutes = Environment.get_string("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "86400")
+    access_token_expire_minutes = Environment.get_string("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+    # refresh tokens are issued at login and get new access tokens from /v1/user/refresh , the user is read then
+    refresh_token_expire_minutes = Environment.get_int("JWT_REFRESH_TOKEN_EXPIRE_MINUTES", 43200)
+    # per worker cache of verified tokens , a token is verified once and its data reused until it expires
+    decode_cache_enabled = Environment.get_bool("JWT_DECODE_CACHE_ENABLED", True)
+    decode_cache_size = Environment.get_int("JWT_DECODE_CACHE_SIZE", 10000)
+
+
+class Auth:
+    # per worker cache of the role and status of token users , checked on every authenticated request.
+    # changes are pushed to all workers , the ttl only bounds staleness if a push is lost. a ttl of 0 disables it
+    user_status_cache_size = Environment.get_int("AUTH_USER_STATUS_CACHE_SIZE", 10000)
+    user_status_cache_ttl_seconds = Environment.get_float("AUTH_USER_STATUS_CACHE_TTL_SECONDS", 30)
+    # stateless auth trusts the token of a request without reading its user , suspended users are rejected through
+    # a per worker revocation list instead , filled from notifications and reloaded from db when the listener connects
+    stateless_enabled = Environment.get_bool("AUTH_STATELESS_ENABLED", False)
+    # password hashing runs on a per worker thread pool of this many threads , calls beyond it wait in a queue
+    # bounded in length and in wait time , and are rejected with a 503 once either bound is hit
+    password_hash_workers = Environment.get_int("AUTH_PASSWORD_HASH_WORKERS", 2)
+    password_hash_max_queued = Environment.get_int("AUTH_PASSWORD_HASH_MAX_QUEUED", 16)
+    password_hash_queue_timeout_seconds = Environment.get_float("AUTH_PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", 2)
+    # passlib schemes , the first one hashes new passwords and the others are only accepted until the next login ,
+    # which rehashes to the first. the first scheme is held to exactly password_hash_rounds rounds , in its own unit
+    # (log2 for bcrypt) , and 0 leaves it at the passlib default
+    password_hash_schemes = [scheme.strip() for scheme in
+                             Environment.get_string("AUTH_PASSWORD_HASH_SCHEMES", "bcrypt").split(",")]
+    password_hash_rounds = Environment.get_int("AUTH_PASSWORD_HASH_ROUNDS", 0)
+
+
+class Inventory:
+    # page size of the inventory listing when the client does not ask for one , and the largest page allowed
+    page_default_limit = Environment.get_int("INVENTORY_PAGE_DEFAULT_LIMIT", 100)
+    page_max_limit = Environment.get_int("INVENTORY_PAGE_MAX_LIMIT", 1000)
+    # rows fetched per round trip from the server side cursor of the catalog export
+    export_batch_size = Environment.get_int("INVENTORY_EXPORT_BATCH_SIZE", 1000)
+    # rows validated and upserted per statement by the bulk import , capped by the postgres limit of bind parameters
+    # per statement (about 2900 rows) , and the most row errors reported back
+    import_batch_size = Environment.get_int("INVENTORY_IMPORT_BATCH_SIZE", 1000)
+    import_max_errors = Environment.get_int("INVENTORY_IMPORT_MAX_ERRORS", 1000)
+    # per worker cache of item metadata (everything but stock) , a ttl of 0 disables it
+    item_cache_size = Environment.get_int("INVENTORY_ITEM_CACHE_SIZE", 10000)
+    item_cache_ttl_seconds = Environment.get_float("INVENTORY_ITEM_CACHE_TTL_SECONDS", 60)
+    # serve the listing from per worker snapshots of serialised pages , kept while the inventory version and stock
+    # stamp are current. both are re-read when a catalog change is heard of and every snapshot_refresh_seconds , stock
+    # changes are not notified so snapshot pages may lag them by that long. pages are dropped after
+    # snapshot_max_age_seconds anyway
+    snapshot_enabled = Environment.get_bool("INVENTORY_SNAPSHOT_ENABLED", False)
+    snapshot_refresh_seconds = Environment.get_float("INVENTORY_SNAPSHOT_REFRESH_SECONDS", 2)
+    snapshot_max_age_seconds = Environment.get_float("INVENTORY_SNAPSHOT_MAX_AGE_SECONDS", 300)
+    snapshot_max_pages = Environment.get_int("INVENTORY_SNAPSHOT_MAX_PAGES", 256)
+    snapshot_gzip = Environment.get_bool("INVENTORY_SNAPSHOT_GZIP", True)
+
+
+class Server:
+    host = Environment.get_string("SERVER_HOST", "0.0.0.0")
+    port = Environment.get_int("SERVER_PORT", 9999)
+    # worker processes , 0 runs one per cpu the server may use but no more than fit in db_connection_budget. every
+    # worker holds its own db pools , caches and notification listener connection , db connections grow with the
+    # workers
+    workers = Environment.get_int("SERVER_WORKERS", 0)
+    # connections to the primary db all workers of this server may open together , keep it below the max_connections
+    # of postgres shared by every server. the default fits 4 workers with the default pool settings
+    db_connection_budget = Environment.get_int("SERVER_DB_CONNECTION_BUDGET", 90)
+    # event loop and http parser of the workers , auto picks uvloop and httptools when they are installed
+    loop = Environment.get_string("SERVER_LOOP", "auto")
+    http = Environment.get_string("SERVER_HTTP", "auto")
+    keepalive_seconds = Environment.get_int("SERVER_KEEPALIVE_SECONDS", 5)
+    backlog = Environment.get_int("SERVER_BACKLOG", 2048)
+    # a worker is replaced once it served max_requests plus a random jitter of up to max_requests_jitter requests ,
+    # the jitter keeps workers from being replaced all at once. 0 never replaces them
+    max_requests = Environment.get_int("SERVER_MAX_REQUESTS", 10000)
+    max_requests_jitter = Environment.get_int("SERVER_MAX_REQUESTS_JITTER", 1000)
+    # time a stopping worker gets to drain the requests in flight , and a worker gets to check in before it is killed
+    graceful_timeout_seconds = Environment.get_int("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30)
+    timeout_seconds = Environment.get_int("SERVER_TIMEOUT_SECONDS", 60)
+    # import the app once before forking the workers , they share the memory of the loaded code. the app connects to
+    # nothing on import , every worker opens its own connections
+    preload = Environment.get_bool("SERVER_PRELOAD", True)
+    log_level = Environment.get_string("SERVER_LOG_LEVEL", "info")
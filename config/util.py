@@ -7,3 +7,15 @@ class Environment:
     @classmethod
     def get_string(cls, config_name, default=""):
         return str(os.getenv(config_name, default))
+
+    @classmethod
+    def get_int(cls, config_name, default=0):
+        return int(os.getenv(config_name, default))
+
+    @classmethod
+    def get_float(cls, config_name, default=0.0):
+        return float(os.getenv(config_name, default))
+
+    @classmethod
+    def get_bool(cls, config_name, default=False):
+        return str(os.getenv(config_name, default)).strip().lower() in ("1", "true", "yes", "on")
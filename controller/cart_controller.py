@@ -1,29 +1,37 @@
 import http
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 from fastapi.params import Path
 
 from controller.context_manager import build_request_context
+from data_adapter.db import use_read_replica, use_read_only_session
 from models.base import GenericResponseModel
 from models.cart import CartItemQuantity
 from server.auth import rbac_access_checker, RBACResource, RBACAccessType
 from service.cart_service import CartService
-from utils.helper import build_api_response
+from utils.helper import build_api_response, build_not_modified_response, etag_matches
 
 cart_router = APIRouter(prefix="/v1/cart", tags=["cart"])
 
 
 @cart_router.get("", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
+@use_read_replica
+@use_read_only_session
 @rbac_access_checker(resource=RBACResource.cart, rbac_access_type=RBACAccessType.read)
-async def get_cart_items(_=Depends(build_request_context)):
+async def get_cart_items(if_none_match: Optional[str] = Header(None), _=Depends(build_request_context)):
     """
     Get all items from cart
+    :param if_none_match: ETag of the cart the client already has , answered with 304 if it is still current
     :param _: build_request_context dependency injection handles the request context
     :return: GenericResponseModel
     """
-    response: GenericResponseModel = CartService.get_cart_for_customer()
-    return build_api_response(response)
+    etag: Optional[str] = await CartService.get_cart_etag()
+    if etag and etag_matches(if_none_match, etag):
+        return await build_not_modified_response(etag)
+    response: GenericResponseModel = await CartService.get_cart_for_customer()
+    return await build_api_response(response, etag=etag)
 
 
 @cart_router.post("/item/{item_uuid}", status_code=http.HTTPStatus.CREATED, response_model=GenericResponseModel)
@@ -38,9 +46,9 @@ async def add_item_to_cart(add_item_request: CartItemQuantity,
     :param _: build_request_context dependency injection handles the request context
     :return: GenericResponseModel
     """
-    response: GenericResponseModel = CartService.add_item_to_cart(item_uuid=item_uuid,
-                                                                  add_item_request=add_item_request)
-    return build_api_response(response)
+    response: GenericResponseModel = await CartService.add_item_to_cart(item_uuid=item_uuid,
+                                                                        add_item_request=add_item_request)
+    return await build_api_response(response)
 
 
 @cart_router.delete("/item/{cart_item_uuid}", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
@@ -55,6 +63,6 @@ async def remove_item_from_cart(remove_item_request: CartItemQuantity,
     :param cart_item_uuid: item uuid to remove from cart
     :return: GenericResponseModel
     """
-    response: GenericResponseModel = CartService.remove_item_from_cart(cart_item_uuid=cart_item_uuid,
-                                                                       remove_item_request=remove_item_request)
-    return build_api_response(response)
+    response: GenericResponseModel = await CartService.remove_item_from_cart(cart_item_uuid=cart_item_uuid,
+                                                                             remove_item_request=remove_item_request)
+    return await build_api_response(response)
@@ -2,19 +2,21 @@ from contextvars import ContextVar
 
 import uuid
 from fastapi import Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from data_adapter.db import get_db
-from data_adapter.user import User
+from config.settings import Auth
+from data_adapter.db import end_db_session, get_db
+from data_adapter.query_stats import DBQueryStats
+from data_adapter.user import User, revoked_users
 from logger import logger
-from models.user import UserTokenData, UserModel, UserStatus
+from models.user import UserTokenData, UserStatusModel, UserStatus
 from utils.exceptions import AuthException
 
 # we are using context variables to store request level context , as FASTAPI
 # does not provide request context out of the box
 
 # context_db_session stores db session created for every request
-context_db_session: ContextVar[Session] = ContextVar('db_session', default=None)
+context_db_session: ContextVar[AsyncSession] = ContextVar('db_session', default=None)
 # context_api_id stores unique id for every request
 context_api_id: ContextVar[str] = ContextVar('api_id', default=None)
 # context_log_meta stores log meta data for every request
@@ -25,18 +27,24 @@ context_user_id: ContextVar[str] = ContextVar('user_id', default=None)
 context_actor_user_data: ContextVar[UserTokenData] = ContextVar('actor_user_data', default=None)
 # context_set_db_session_rollback stores flag to rollback db session or not
 context_set_db_session_rollback: ContextVar[bool] = ContextVar('set_db_session_rollback', default=False)
+# context_db_query_stats stores count and time of the db statements run for every request
+context_db_query_stats: ContextVar[DBQueryStats] = ContextVar('db_query_stats', default=None)
 
 
 async def build_request_context(request: Request,
-                                db: Session = Depends(get_db)):
+                                db: AsyncSession = Depends(get_db)):
     # set the db-session in context-var so that we don't have to pass this dependency downstream
     context_db_session.set(db)
     context_api_id.set(str(uuid.uuid4()))
     context_user_id.set(request.headers.get('X-User-ID'))
     # fetch the token from context and check if the user is active or not
     user_data_from_context: UserTokenData = context_actor_user_data.get()
-    if user_data_from_context:
-        user: UserModel = User.get_by_uuid(user_data_from_context.uuid)
+    if user_data_from_context and Auth.stateless_enabled:
+        # the token is trusted as it is , only revocations since it was issued are checked
+        if revoked_users.is_revoked(User.status_cache_key(user_data_from_context.uuid), user_data_from_context.iat):
+            raise AuthException(status_code=401, message="Invalid authentication credentials, token is revoked")
+    elif user_data_from_context:
+        user: UserStatusModel = await User.get_status_by_uuid(user_data_from_context.uuid)
         error_message = None
         if not user:
             error_message = "Invalid authentication credentials, user not found"
@@ -51,6 +59,16 @@ async def build_request_context(request: Request,
     logger.info(extra=context_log_meta.get(), msg="REQUEST_INITIATED")
 
 
-def get_db_session() -> Session:
+def get_db_session() -> AsyncSession:
     """common method to get db session from context variable"""
     return context_db_session.get()
+
+
+async def release_db_session():
+    """
+    ends the transaction of the request db session and returns its connection to the pool , called once the
+    service layer is done so that the connection is not held while the response is serialised and sent
+    """
+    db: AsyncSession = context_db_session.get()
+    if db is not None:
+        await end_db_session(db)
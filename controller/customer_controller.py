@@ -21,5 +21,5 @@ async def suspend_user(customer_uuid: str = Path(..., description="Customer uuid
     :param customer_uuid: user uuid to suspend
     :return: GenericResponseModel
     """
-    response: GenericResponseModel = CustomerService.suspend_customer(customer_uuid=customer_uuid)
-    return build_api_response(response)
+    response: GenericResponseModel = await CustomerService.suspend_customer(customer_uuid=customer_uuid)
+    return await build_api_response(response)
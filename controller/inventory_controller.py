@@ -1,27 +1,58 @@
 import http
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 
-from controller.context_manager import build_request_context
+from config.settings import Inventory
+from controller.context_manager import build_request_context, release_db_session
+from data_adapter.db import use_read_replica, use_read_only_session
 from models.base import GenericResponseModel
-from models.inventory import ItemInsertModel
+from models.inventory import ItemInsertModel, ItemCategory, ItemFilterModel, ExportFormat, ImportConflictAction
 from server.auth import rbac_access_checker, RBACResource, RBACAccessType
 from service.inventory_service import InventoryService
-from utils.helper import build_api_response
+from service.inventory_snapshot import inventory_snapshot
+from utils.helper import build_api_response, build_not_modified_response, etag_matches, iter_lines
 
 inventory_router = APIRouter(prefix="/v1/inventory/items", tags=["inventory", "items"])
 
 
 @inventory_router.get("", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
+@use_read_replica
+@use_read_only_session
 @rbac_access_checker(resource=RBACResource.inventory, rbac_access_type=RBACAccessType.read)
-async def get_items_from_inventory(_=Depends(build_request_context)):
+async def get_items_from_inventory(limit: int = Query(Inventory.page_default_limit, ge=1, le=Inventory.page_max_limit),
+                                   after: Optional[str] = Query(None, description="next_cursor of previous page"),
+                                   category: Optional[ItemCategory] = Query(None),
+                                   min_price: Optional[float] = Query(None, ge=0),
+                                   max_price: Optional[float] = Query(None, ge=0),
+                                   in_stock: bool = Query(False, description="only items with quantity left"),
+                                   if_none_match: Optional[str] = Header(None),
+                                   accept_encoding: Optional[str] = Header(None),
+                                   _=Depends(build_request_context)):
     """
-    Get all items from inventory
+    Get items from inventory , keyset paginated on (created_at, id)
+    :param limit: page size
+    :param after: cursor to fetch the page after
+    :param category: filter by category
+    :param min_price: filter by min price
+    :param max_price: filter by max price
+    :param in_stock: filter out of stock items
+    :param if_none_match: ETag of the listing the client already has , answered with 304 if it is still current
+    :param accept_encoding: snapshot pages are sent gzipped when the client accepts it
     :param _: build_request_context dependency injection handles the request context
     :return: GenericResponseModel
     """
-    response = InventoryService.get_all_items_in_inventory()
-    return build_api_response(response)
+    filters = ItemFilterModel(category=category, min_price=min_price, max_price=max_price, in_stock=in_stock)
+    if Inventory.snapshot_enabled:
+        return await inventory_snapshot.get_items_response(limit=limit, after=after, filters=filters,
+                                                           if_none_match=if_none_match,
+                                                           accept_encoding=accept_encoding)
+    etag = await InventoryService.get_inventory_etag()
+    if etag_matches(if_none_match, etag):
+        return await build_not_modified_response(etag)
+    response = await InventoryService.get_items_in_inventory(limit=limit, after=after, filters=filters)
+    return await build_api_response(response, etag=etag)
 
 
 @inventory_router.post("", status_code=http.HTTPStatus.CREATED, response_model=GenericResponseModel)
@@ -33,5 +64,44 @@ async def add_item_to_inventory(item: ItemInsertModel, _=Depends(build_request_c
     :param item: item details to add
     :return:
     """
-    response = InventoryService.add_item_to_inventory(item=item)
-    return build_api_response(response)
+    response = await InventoryService.add_item_to_inventory(item=item)
+    return await build_api_response(response)
+
+
+@inventory_router.post("/import", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
+@rbac_access_checker(resource=RBACResource.inventory, rbac_access_type=RBACAccessType.write)
+async def import_items_to_inventory(request: Request,
+                                    import_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+                                    on_conflict: ImportConflictAction = Query(ImportConflictAction.SKIP),
+                                    _=Depends(build_request_context)):
+    """
+    Bulk import items from an ndjson or csv request body , the body is read as a stream
+    :param request: request whose body is the file to import
+    :param import_format: ndjson or csv
+    :param on_conflict: skip or update items already in inventory with the same name and category
+    :param _: build_request_context dependency injection handles the request context
+    :return: GenericResponseModel with the import report
+    """
+    # batches are written in their own sessions , the request session is not kept open while the body is uploaded
+    await release_db_session()
+    response = await InventoryService.import_items(iter_lines(request.stream()), import_format, on_conflict)
+    return await build_api_response(response)
+
+
+@inventory_router.get("/export", status_code=http.HTTPStatus.OK, response_class=StreamingResponse)
+@use_read_replica
+@use_read_only_session
+@rbac_access_checker(resource=RBACResource.inventory_export, rbac_access_type=RBACAccessType.read)
+async def export_inventory(export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+                           _=Depends(build_request_context)):
+    """
+    Stream the whole inventory catalog as ndjson or csv
+    :param export_format: ndjson or csv
+    :param _: build_request_context dependency injection handles the request context
+    :return: StreamingResponse
+    """
+    # the stream reads through its own session , the request session is not needed while streaming
+    await release_db_session()
+    return StreamingResponse(InventoryService.export_items(export_format),
+                             media_type=InventoryService.EXPORT_MEDIA_TYPES[export_format],
+                             headers={"Content-Disposition": f'attachment; filename="inventory.{export_format.value}"'})
@@ -1,9 +1,17 @@
 import http
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
+from sqlalchemy import text
 
-from data_adapter.db import db_engine
+from controller.context_manager import build_request_context
+from data_adapter.db import db_engine, replica_db_engine
+from data_adapter.inventory import item_metadata_cache
+from data_adapter.user import user_status_cache, revoked_users
+from server.auth import authenticate_token, rbac_access_checker, RBACResource, RBACAccessType
+from service.inventory_snapshot import inventory_snapshot
+from utils.jwt_token_handler import decoded_token_cache
+from utils.password_hasher import password_hashing_pool
 
 router = APIRouter(tags=["health_checks", "status"])
 
@@ -16,8 +24,33 @@ async def status_check():
 
 @router.get("/deepstatus", status_code=http.HTTPStatus.OK)
 async def deep_status_check():
-    is_db_ok = db_engine.execute("select 'true'").cursor.fetchone()[0]
+    async with db_engine.connect() as connection:
+        is_db_ok = (await connection.execute(text("select 'true'"))).scalar()
     if not is_db_ok:
         return JSONResponse(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
                             content={'error': "db not connected"})
     return JSONResponse(status_code=http.HTTPStatus.OK, content={'db': is_db_ok})
+
+
+#  internals of the worker , admin only
+@router.get("/poolstatus", status_code=http.HTTPStatus.OK, dependencies=[Depends(authenticate_token)])
+@rbac_access_checker(resource=RBACResource.status, rbac_access_type=RBACAccessType.read)
+async def pool_status_check(_=Depends(build_request_context)):
+    # pool stats are per worker process
+    content = {'db_pool': db_engine.sync_engine.pool.stats()}
+    if replica_db_engine is not None:
+        content['db_replica_pool'] = replica_db_engine.sync_engine.pool.stats()
+    content['password_hashing_pool'] = password_hashing_pool.stats()
+    return JSONResponse(status_code=http.HTTPStatus.OK, content=content)
+
+
+@router.get("/cachestatus", status_code=http.HTTPStatus.OK, dependencies=[Depends(authenticate_token)])
+@rbac_access_checker(resource=RBACResource.status, rbac_access_type=RBACAccessType.read)
+async def cache_status_check(_=Depends(build_request_context)):
+    # caches are per worker process
+    content = {'item_metadata_cache': item_metadata_cache.stats(),
+               'user_status_cache': user_status_cache.stats(),
+               'revoked_users': revoked_users.stats(),
+               'decoded_token_cache': decoded_token_cache.stats(),
+               'inventory_snapshot': inventory_snapshot.pages.stats()}
+    return JSONResponse(status_code=http.HTTPStatus.OK, content=content)
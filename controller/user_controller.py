@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends
 
 from controller.context_manager import build_request_context
 from models.base import GenericResponseModel
-from models.user import UserInsertModel, UserLoginModel
+from models.user import UserInsertModel, UserLoginModel, RefreshTokenModel
 from service.user_service import UserService
 from utils.helper import build_api_response
 
@@ -19,8 +19,8 @@ async def signup_user(user: UserInsertModel, _=Depends(build_request_context)):
     :param user: user details to add
     :return:
     """
-    response: GenericResponseModel = UserService.signup_user(user=user)
-    return build_api_response(response)
+    response: GenericResponseModel = await UserService.signup_user(user=user)
+    return await build_api_response(response)
 
 
 @user_router.post("/login", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
@@ -31,5 +31,17 @@ async def login_user(user_login_request: UserLoginModel, _=Depends(build_request
     :param user_login_request: user login details
     :return: GenericResponseModel
     """
-    response: GenericResponseModel = UserService.login_user(user_login_request=user_login_request)
-    return build_api_response(response)
+    response: GenericResponseModel = await UserService.login_user(user_login_request=user_login_request)
+    return await build_api_response(response)
+
+
+@user_router.post("/refresh", status_code=http.HTTPStatus.OK, response_model=GenericResponseModel)
+async def refresh_access_token(refresh_request: RefreshTokenModel, _=Depends(build_request_context)):
+    """
+    Refresh access token
+    :param _: build_request_context dependency injection handles the request context
+    :param refresh_request: refresh token issued at login
+    :return: GenericResponseModel
+    """
+    response: GenericResponseModel = await UserService.refresh_access_token(refresh_request=refresh_request)
+    return await build_api_response(response)
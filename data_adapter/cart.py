@@ -1,10 +1,15 @@
-from sqlalchemy import Column, INTEGER, ForeignKey
-from sqlalchemy.orm import relationship, contains_eager
+import hashlib
+from typing import Optional
+
+from sqlalchemy import Column, INTEGER, ForeignKey, select, update, and_, func, lambda_stmt, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import relationship, contains_eager, query_expression, with_expression
 
 from data_adapter.db import CartDBBase, DBBase
 from data_adapter.inventory import Item
 from data_adapter.user import User
-from models.cart import CartModel, CartItemModel
+from models.cart import CartModel, CartItemModel, CartResponseModel, CartItemResponseModel
+from models.user import UserResponseModel
 
 
 class CustomerCart(DBBase, CartDBBase):
@@ -14,41 +19,113 @@ class CustomerCart(DBBase, CartDBBase):
     customer_id = Column(INTEGER, ForeignKey(User.id), nullable=False)
 
     #  relationship one to many with cart item
-    cart_items = relationship('CartItem', back_populates='cart')
+    #  relationships are eagerly loaded as lazy loading is not supported by async sessions
+    cart_items = relationship('CartItem', back_populates='cart', lazy='selectin')
     #  relationship one to one with user
-    customer = relationship(User)
+    customer = relationship(User, lazy='joined')
+    #  sum of price * quantity of the cart items , only loaded by reads that compute it in sql
+    total_price = query_expression()
 
     def __to_model(self) -> CartModel:
         """converts db orm object to pydantic model"""
         return CartModel.from_orm(self)
 
     @classmethod
-    def get_by_id(cls, id) -> CartModel:
-        user_cart = super().get_by_id(id)
+    async def get_by_id(cls, id) -> CartModel:
+        user_cart = await super().get_by_id(id)
         return user_cart.__to_model() if user_cart else None
 
     @classmethod
-    def get_by_uuid(cls, uuid) -> CartModel:
-        user_cart = super().get_by_uuid(uuid)
+    async def get_by_uuid(cls, uuid) -> CartModel:
+        user_cart = await super().get_by_uuid(uuid)
         return user_cart.__to_model() if user_cart else None
 
     @classmethod
-    def get_by_customer_uuid(cls, customer_uuid: str) -> CartModel:
+    async def get_by_customer_uuid(cls, customer_uuid: str) -> CartModel:
+        """
+        reads cart , customer , cart items with their items and the cart total in a single query.
+        cart items are outer joined so that a cart whose items were all removed is still found
+        """
         from controller.context_manager import get_db_session
-        db = get_db_session()
-        #  using eager loading to avoid CartItem filter not getting applied
-        user_cart = db.query(cls).join(cls.customer).join(CartItem). \
-            filter(User.uuid == customer_uuid, cls.is_deleted.is_(False), CartItem.is_deleted.is_(False)).options(
-            contains_eager(cls.cart_items)).first()
+        db: AsyncSession = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls).join(cls.customer)
+            .outerjoin(CartItem, and_(CartItem.cart_id == cls.id, CartItem.is_deleted.is_(False)))
+            .outerjoin(Item, Item.id == CartItem.item_id)
+            .filter(User.uuid == type_coerce(customer_uuid, User.uuid.type), cls.is_deleted.is_(False))
+            .order_by(cls.id, CartItem.id)
+            .options(contains_eager(cls.customer),
+                     contains_eager(cls.cart_items).contains_eager(CartItem.original_item),
+                     with_expression(cls.total_price, func.coalesce(
+                         func.sum(Item.price * CartItem.quantity_in_cart).over(partition_by=cls.id), 0)))))
+        user_cart = result.unique().scalars().first()
         return user_cart.__to_model() if user_cart else None
 
     @classmethod
-    def create_cart_for_customer(cls, customer_id: int) -> CartModel:
+    async def get_cart_response_by_customer_uuid(cls, customer_uuid: str) -> Optional[CartResponseModel]:
+        """
+        read only path of get_by_customer_uuid , selects only the columns of the cart response as plain rows , one row
+        per cart item , and builds the response models from them without orm objects or validation
+        """
         from controller.context_manager import get_db_session
-        db = get_db_session()
+        db: AsyncSession = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls.id, User.first_name, User.last_name, User.email, User.role,
+                           CartItem.uuid.label('cart_item_uuid'), CartItem.quantity_in_cart,
+                           Item.uuid, Item.category, Item.name, Item.description, Item.price, Item.image,
+                           Item.quantity,
+                           func.coalesce(func.sum(Item.price * CartItem.quantity_in_cart).over(partition_by=cls.id),
+                                         0).label('total_price'))
+            .join(User, User.id == cls.customer_id)
+            .outerjoin(CartItem, and_(CartItem.cart_id == cls.id, CartItem.is_deleted.is_(False)))
+            .outerjoin(Item, Item.id == CartItem.item_id)
+            .filter(User.uuid == type_coerce(customer_uuid, User.uuid.type), cls.is_deleted.is_(False))
+            .order_by(cls.id, CartItem.id)))
+        rows = result.all()
+        if not rows:
+            return None
+        first = rows[0]
+        return CartResponseModel.construct(
+            cart_items=[CartItemResponseModel.construct(original_item=Item.build_item_response(row),
+                                                        uuid=row.cart_item_uuid,
+                                                        quantity_in_cart=row.quantity_in_cart)
+                        for row in rows if row.id == first.id and row.cart_item_uuid is not None],
+            customer=UserResponseModel.construct(first_name=first.first_name, last_name=first.last_name,
+                                                 email=first.email, role=first.role),
+            total_price=first.total_price)
+
+    @classmethod
+    async def get_cart_version(cls, customer_uuid: str) -> Optional[str]:
+        """
+        version of the cart response of a customer , a digest of the update times of the cart , the customer , the
+        cart items and their inventory items and of the cart item count. any change to the response changes one of
+        them , adding or removing items changes the count or the latest update time
+        :return: version , None if the customer has no cart
+        """
+        from controller.context_manager import get_db_session
+        db: AsyncSession = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls.id, cls.updated_at, User.updated_at, func.count(CartItem.id),
+                           func.max(CartItem.updated_at), func.max(Item.updated_at))
+            .join(User, User.id == cls.customer_id)
+            .outerjoin(CartItem, and_(CartItem.cart_id == cls.id, CartItem.is_deleted.is_(False)))
+            .outerjoin(Item, Item.id == CartItem.item_id)
+            .filter(User.uuid == type_coerce(customer_uuid, User.uuid.type), cls.is_deleted.is_(False))
+            .group_by(cls.id, User.id)
+            .order_by(cls.id)
+            .limit(1)))
+        row = result.first()
+        return hashlib.sha1(repr(tuple(row)).encode()).hexdigest() if row else None
+
+    @classmethod
+    async def create_cart_for_customer(cls, customer_id: int) -> CartModel:
+        from controller.context_manager import get_db_session
+        db: AsyncSession = get_db_session()
         user_cart = cls(customer_id=customer_id)
         db.add(user_cart)
-        db.flush()
+        await db.flush()
+        #  load the customer and cart items relationships for the newly created cart
+        await db.refresh(user_cart)
         return user_cart.__to_model()
 
 
@@ -62,7 +139,7 @@ class CartItem(DBBase, CartDBBase):
     # relationship many to one with cart
     cart = relationship(CustomerCart, back_populates='cart_items')
     # relationship many to one with item
-    original_item = relationship('Item')
+    original_item = relationship('Item', lazy='joined')
 
     def __to_model(self) -> CartItemModel:
         """converts db orm object to pydantic model"""
@@ -72,24 +149,32 @@ class CartItem(DBBase, CartDBBase):
         return self.__to_model()
 
     @classmethod
-    def add_item_to_cart(cls, cart_id: int, item_id: int, quantity: int) -> CartItemModel:
+    async def get_by_uuid(cls, uuid) -> CartItemModel:
+        cart_item = await super().get_by_uuid(uuid)
+        return cart_item.__to_model() if cart_item else None
+
+    @classmethod
+    async def add_item_to_cart(cls, cart_id: int, item_id: int, quantity: int) -> CartItemModel:
         from controller.context_manager import get_db_session
-        db = get_db_session()
+        db: AsyncSession = get_db_session()
         cart_item = cls(cart_id=cart_id, item_id=item_id, quantity_in_cart=quantity)
         db.add(cart_item)
-        db.flush()
+        await db.flush()
+        #  load the original item relationship for the newly added cart item
+        await db.refresh(cart_item)
         return cart_item.__to_model()
 
     @classmethod
-    def delete_item_from_cart(cls, cart_item_id: int):
+    async def delete_item_from_cart(cls, cart_item_id: int):
         from controller.context_manager import get_db_session
-        db = get_db_session()
-        db.query(cls).filter(cls.id == cart_item_id).update({cls.is_deleted: True, cls.quantity_in_cart: 0})
-        db.flush()
+        db: AsyncSession = get_db_session()
+        await db.execute(update(cls).filter(cls.id == cart_item_id).values(
+            {cls.is_deleted: True, cls.quantity_in_cart: 0}))
+        await db.flush()
 
     @classmethod
-    def update_item_quantity_in_cart(cls, cart_item_id: int, quantity: int):
+    async def update_item_quantity_in_cart(cls, cart_item_id: int, quantity: int):
         from controller.context_manager import get_db_session
-        db = get_db_session()
-        db.query(cls).filter(cls.id == cart_item_id).update({cls.quantity_in_cart: quantity})
-        db.flush()
+        db: AsyncSession = get_db_session()
+        await db.execute(update(cls).filter(cls.id == cart_item_id).values({cls.quantity_in_cart: quantity}))
+        await db.flush()
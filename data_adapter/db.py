@@ -1,26 +1,120 @@
 from datetime import datetime
+from typing import Awaitable, Callable
 from urllib.parse import quote_plus
 
 import uuid as uuid
+from fastapi import Request
 from pytz import timezone
-from sqlalchemy import Column, TIMESTAMP, Boolean, Integer, create_engine
+from sqlalchemy import Column, TIMESTAMP, Boolean, Integer, select, lambda_stmt, type_coerce
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 
 from config.settings import DB
+from data_adapter.pool import InstrumentedAsyncQueuePool
+from data_adapter.query_stats import instrument_query_stats
 from logger import logging
+from utils.exceptions import ReadOnlySessionException
 
-DBTYPE_POSTGRES = 'postgresql'
+DBTYPE_POSTGRES = 'postgresql+asyncpg'
 CORE_SQLALCHEMY_DATABASE_URI = '%s://%s:%s@%s:%s/%s' % (
     DBTYPE_POSTGRES, DB.user, quote_plus(DB.pass_), DB.host, DB.port, DB.name)
 
-db_engine = create_engine(CORE_SQLALCHEMY_DATABASE_URI)
+# async engine backed by asyncpg , so that db round trips don't block the event loop
+db_engine = create_async_engine(CORE_SQLALCHEMY_DATABASE_URI, poolclass=InstrumentedAsyncQueuePool,
+                                pool_size=DB.pool_size, max_overflow=DB.pool_max_overflow,
+                                pool_timeout=DB.pool_timeout_seconds, pool_recycle=DB.pool_recycle_seconds,
+                                pool_pre_ping=DB.pool_pre_ping, pool_use_lifo=DB.pool_use_lifo)
+# count statements and db time of every request
+instrument_query_stats(db_engine.sync_engine)
+
+# optional streaming replica of the primary , used only by read only endpoints
+replica_db_engine = None
+if DB.replica_host:
+    REPLICA_SQLALCHEMY_DATABASE_URI = '%s://%s:%s@%s:%s/%s' % (
+        DBTYPE_POSTGRES, DB.user, quote_plus(DB.pass_), DB.replica_host, DB.replica_port, DB.name)
+    replica_db_engine = create_async_engine(REPLICA_SQLALCHEMY_DATABASE_URI, poolclass=InstrumentedAsyncQueuePool,
+                                            pool_size=DB.pool_size, max_overflow=DB.pool_max_overflow,
+                                            pool_timeout=DB.pool_timeout_seconds,
+                                            pool_recycle=DB.pool_recycle_seconds, pool_pre_ping=DB.pool_pre_ping,
+                                            pool_use_lifo=DB.pool_use_lifo)
+    instrument_query_stats(replica_db_engine.sync_engine)
+
+# read only sessions share the pool of their engine , their transactions begin as READ ONLY so postgres rejects
+# writes
+read_only_db_engine = db_engine.execution_options(postgresql_readonly=True)
+read_only_replica_db_engine = replica_db_engine.execution_options(postgresql_readonly=True) \
+    if replica_db_engine is not None else None
+# single statements that must not wait for the request transaction , shares the pool of the primary engine
+autocommit_db_engine = db_engine.execution_options(isolation_level="AUTOCOMMIT")
 
 logging.getLogger('sqlalchemy.engine').setLevel(logging.DEBUG)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+# session info key marking a session of a read only endpoint , which may read from the replica
+SESSION_INFO_USE_REPLICA = 'use_replica'
+# session info key marking a session which must not write , its statements run in READ ONLY transactions
+SESSION_INFO_READ_ONLY = 'read_only'
+# session info key set once the session has written , so that later reads see the write
+SESSION_INFO_WROTE = 'wrote'
+# session info key set once the session is committed or rolled back and closed by end_db_session
+SESSION_INFO_ENDED = 'ended'
+# session info key of the callbacks awaited once the session has committed
+SESSION_INFO_AFTER_COMMIT = 'after_commit'
+
+
+class RoutingSession(Session):
+    """
+    session which sends plain selects of read only endpoints to the replica.
+    everything else goes to the primary , and so does every read once the session has written anything.
+    read only sessions run their statements in READ ONLY transactions and raise on any write
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # is_select is also answered by lambda statements , which wrap their select
+        is_select = clause is not None and clause.is_select
+        read_only = self.info.get(SESSION_INFO_READ_ONLY)
+        if self._flushing or (clause is not None and not is_select) \
+                or (is_select and clause._for_update_arg is not None):
+            if read_only:
+                raise ReadOnlySessionException(message="write attempted in a read only request")
+            self.info[SESSION_INFO_WROTE] = True
+        elif replica_db_engine is not None and is_select \
+                and self.info.get(SESSION_INFO_USE_REPLICA) and not self.info.get(SESSION_INFO_WROTE):
+            return (read_only_replica_db_engine if read_only else replica_db_engine).sync_engine
+        elif read_only:
+            return read_only_db_engine.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """AsyncSession proxying a RoutingSession , AsyncSession of sqlalchemy 1.4.22 always proxies a plain Session"""
+
+    def __init__(self, bind=None, **kw):
+        kw["future"] = True
+        self.bind = bind
+        self.sync_session = self._proxied = self._assign_proxied(RoutingSession(bind=bind.sync_engine, **kw))
+
+
+# expire_on_commit is disabled as orm objects are converted to pydantic models after the session is committed
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine, class_=RoutingAsyncSession,
+                            expire_on_commit=False)
+
+
+def use_read_replica(func):
+    """marks an endpoint as read only , its db reads are served by the replica when one is configured"""
+    func.use_read_replica = True
+    return func
+
+
+def use_read_only_session(func):
+    """
+    runs the db statements of an endpoint in a READ ONLY transaction , which is rolled back instead of committed.
+    writes fail with ReadOnlySessionException
+    """
+    func.use_read_only_session = True
+    return func
+
 
 UTC = timezone('UTC')
 
@@ -32,26 +126,70 @@ def time_now():
 DBBase = declarative_base()
 
 
-def get_db():
-    """this function is used to inject db_session dependency in every rest api requests"""
+def run_after_commit(db: AsyncSession, callback: Callable[[], Awaitable]):
+    """
+    registers a coroutine function to await once the session commits , it is dropped if the session rolls back.
+    a callback registered several times runs once
+    """
+    callbacks = db.info.setdefault(SESSION_INFO_AFTER_COMMIT, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+async def end_db_session(db: AsyncSession):
+    """
+    commits the db session , or rolls it back when context_set_db_session_rollback is set , and returns its
+    connection to the pool. a session is ended only once , later calls are no-ops
+    """
     from controller.context_manager import context_set_db_session_rollback
-    db: Session = SessionLocal()
+    if db.info.get(SESSION_INFO_ENDED):
+        return
+    db.info[SESSION_INFO_ENDED] = True
+    committed = False
     try:
-        yield db
-        #  commit the db session if no exception occurs
-        #  if context_set_db_session_rollback is set to True then rollback the db session
+        #  read only sessions have nothing to commit
         if context_set_db_session_rollback.get():
             logging.info('rollback db session')
-            db.rollback()
-        else:
-            db.commit()
+            await db.rollback()
+        elif not db.info.get(SESSION_INFO_READ_ONLY):
+            await db.commit()
+            committed = True
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+    if not committed:
+        return
+    for callback in db.info.pop(SESSION_INFO_AFTER_COMMIT, []):
+        #  the data is committed whatever happens here , a failing callback is logged and not raised
+        try:
+            await callback()
+        except Exception as e:
+            logging.error(f'after commit callback {callback.__qualname__} failed error : {e}')
+
+
+async def get_db(request: Request):
+    """
+    this function is used to inject db_session dependency in every rest api requests
+    the session checks out a pooled connection only when its first statement runs , requests that never query
+    never take a connection. the session is normally ended by build_api_response as soon as the service layer
+    returns , the teardown here only ends sessions that were not ended earlier
+    """
+    endpoint = request.scope.get('endpoint')
+    db: AsyncSession = SessionLocal(info={
+        SESSION_INFO_USE_REPLICA: getattr(endpoint, 'use_read_replica', False),
+        SESSION_INFO_READ_ONLY: getattr(endpoint, 'use_read_only_session', False)})
+    try:
+        yield db
+        await end_db_session(db)
     except Exception as e:
         #  rollback the db session if any exception occurs
         logging.error(e)
-        db.rollback()
+        await db.rollback()
     finally:
         #  close the db session
-        db.close()
+        await db.close()
 
 
 class CartDBBase:
@@ -62,14 +200,21 @@ class CartDBBase:
     updated_at = Column(TIMESTAMP(timezone=True), default=time_now, onupdate=time_now, nullable=False)
     is_deleted = Column(Boolean, default=False)
 
+    #  hot lookups are lambda statements , the select is built and its cache key generated once per class ,
+    #  later calls only pick up the new bound values. values compared to uuid columns are type coerced , lambdas
+    #  type their bound values from the python value and would send a str uuid as varchar
+
     @classmethod
-    def get_by_uuid(cls, uuid):
+    async def get_by_uuid(cls, uuid):
         from controller.context_manager import get_db_session
-        db: Session = get_db_session()
-        return db.query(cls).filter(cls.uuid == uuid, cls.is_deleted.is_(False)).first()
+        db: AsyncSession = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls).filter(cls.uuid == type_coerce(uuid, cls.uuid.type), cls.is_deleted.is_(False))))
+        return result.scalars().first()
 
     @classmethod
-    def get_by_id(cls, id):
+    async def get_by_id(cls, id):
         from controller.context_manager import get_db_session
-        db: Session = get_db_session()
-        return db.query(cls).filter(cls.id == id, cls.is_deleted.is_(False)).first()
+        db: AsyncSession = get_db_session()
+        result = await db.execute(lambda_stmt(lambda: select(cls).filter(cls.id == id, cls.is_deleted.is_(False))))
+        return result.scalars().first()
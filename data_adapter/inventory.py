@@ -1,10 +1,74 @@
-from typing import List
+from typing import List, Optional, AsyncIterator, Tuple
 
-from sqlalchemy import Column, String, Float, INTEGER
-from sqlalchemy.orm import Session
+from sqlalchemy import Column, String, Float, INTEGER, BigInteger, select, update, tuple_, cast, literal_column, \
+    lambda_stmt, type_coerce, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from data_adapter.db import CartDBBase, DBBase
-from models.inventory import ItemModel
+from config.settings import Inventory
+from data_adapter.db import CartDBBase, DBBase, SessionLocal, SESSION_INFO_USE_REPLICA, SESSION_INFO_READ_ONLY, \
+    autocommit_db_engine, run_after_commit, end_db_session
+from data_adapter.notifications import notification_listener, notify, INVENTORY_CHANGED_CHANNEL, \
+    ITEM_CHANGED_CHANNEL, MAX_NOTIFY_PAYLOAD_BYTES
+from models.base import KeysetCursor
+from models.inventory import ItemModel, ItemFilterModel, ItemResponseModel, ItemMetadataModel
+from utils.cache import LRUTTLCache
+
+# item metadata by item uuid , stock is never cached as every reservation changes it. entries are dropped once the
+# writing transaction commits , in every worker through ITEM_CHANGED_CHANNEL
+item_metadata_cache = LRUTTLCache(max_size=Inventory.item_cache_size, ttl_seconds=Inventory.item_cache_ttl_seconds)
+# postgres takes at most this many bind parameters in one statement
+POSTGRES_MAX_BIND_PARAMS = 32767
+
+
+class InventoryVersion(DBBase):
+    """
+    single row counting the committed catalog changes , items created or imported. stock changes of reservations are
+    not counted , every cart write would otherwise queue on this one row , they move the latest updated_at of the
+    items instead. it is bumped only after the writing transaction has committed , so whoever reads a version and then
+    reads items sees at least the changes counted in that version
+    """
+    __tablename__ = 'inventory_version'
+    INVENTORY_VERSION_ID = 1
+
+    id = Column(INTEGER, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+    @classmethod
+    async def get_versions(cls) -> Tuple[int, int]:
+        """
+        :return: the catalog version , and the stock stamp , the latest updated_at of any item in microseconds. both
+        are read in one statement , the stamp from the index on updated_at
+        """
+        from controller.context_manager import get_db_session
+        db = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls.version, select(func.max(Item.updated_at)).scalar_subquery())
+            .filter(cls.id == cls.INVENTORY_VERSION_ID)))
+        row = result.first()
+        if row is None:
+            return 0, 0
+        version, updated_at = row
+        return version, int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+
+    @classmethod
+    async def bump_version(cls):
+        """
+        bumps the version in its own autocommit statement , the row is locked only for that one statement. the new
+        version is notified to every worker in the same statement , this worker handles it right away
+        """
+        bumped = update(cls.__table__).where(cls.id == cls.INVENTORY_VERSION_ID) \
+            .values(version=cls.version + 1).returning(cls.version).cte('bumped')
+        async with autocommit_db_engine.connect() as connection:
+            result = await connection.execute(
+                select(bumped.c.version, func.pg_notify(INVENTORY_CHANGED_CHANNEL, cast(bumped.c.version, String))))
+        version = result.scalar()
+        if version is not None:
+            notification_listener.dispatch(INVENTORY_CHANGED_CHANNEL, str(version))
+
+    @classmethod
+    def bump_version_after_commit(cls, db: AsyncSession):
+        run_after_commit(db, cls.bump_version)
 
 
 class Item(DBBase, CartDBBase):
@@ -22,51 +86,213 @@ class Item(DBBase, CartDBBase):
         return ItemModel.from_orm(self)
 
     @classmethod
-    def create_item(cls, item) -> ItemModel:
+    async def create_item(cls, item) -> ItemModel:
         from controller.context_manager import get_db_session
-        db: Session = get_db_session()
+        db: AsyncSession = get_db_session()
         db.add(item)
-        db.flush()
+        await db.flush()
+        InventoryVersion.bump_version_after_commit(db)
         return item.__to_model()
 
     @classmethod
-    def get_by_id(cls, id) -> ItemModel:
-        item = super().get_by_id(id)
+    async def get_by_id(cls, id) -> ItemModel:
+        item = await super().get_by_id(id)
         return item.__to_model() if item else None
 
     @classmethod
-    def get_by_uuid(cls, uuid) -> ItemModel:
-        item = super().get_by_uuid(uuid)
+    async def get_by_uuid(cls, uuid) -> ItemModel:
+        item = await super().get_by_uuid(uuid)
         return item.__to_model() if item else None
 
     @classmethod
-    def get_all_items(cls) -> List[ItemModel]:
+    async def get_items_page(cls, limit: int, after: Optional[KeysetCursor] = None,
+                             filters: ItemFilterModel = None) -> Tuple[List[ItemResponseModel], Optional[KeysetCursor]]:
+        """
+        keyset paginated items ordered by (created_at, id) , read as plain rows of only the response columns and
+        built straight into response models without orm objects or validation
+        :param limit: max items to return
+        :param after: cursor of the last item of previous page
+        :param filters: optional filters on category , price range and stock
+        :return: items of the page and the cursor of its last item , cursor is None on the last page
+        """
         from controller.context_manager import get_db_session
         db = get_db_session()
-        items = db.query(cls).filter(cls.is_deleted.is_(False)).all()
-        return [item.__to_model() for item in items]
+        query = select(cls.uuid, cls.category, cls.name, cls.description, cls.price, cls.image, cls.quantity,
+                       cls.created_at, cls.id).filter(cls.is_deleted.is_(False))
+        if after:
+            # row comparison keeps the (created_at, id) index usable , the cast types the bind for postgres
+            query = query.filter(tuple_(cls.created_at, cls.id) > tuple_(cast(after.created_at, cls.created_at.type),
+                                                                         after.id))
+        if filters:
+            if filters.category:
+                query = query.filter(cls.category == filters.category)
+            if filters.min_price is not None:
+                query = query.filter(cls.price >= filters.min_price)
+            if filters.max_price is not None:
+                query = query.filter(cls.price <= filters.max_price)
+            if filters.in_stock:
+                # rendered inline , a bound 0 in a generic plan cannot match the predicate of the in stock index
+                query = query.filter(cls.quantity > literal_column("0"))
+        # one extra row is fetched to know if there is a next page
+        result = await db.execute(query.order_by(cls.created_at, cls.id).limit(limit + 1))
+        rows = result.all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = KeysetCursor(created_at=rows[-1].created_at, id=rows[-1].id)
+        return [cls.build_item_response(row) for row in rows], next_cursor
+
+    @staticmethod
+    def build_item_response(row) -> ItemResponseModel:
+        """builds the response model of an item from a row of trusted db values , skipping validation"""
+        return ItemResponseModel.construct(uuid=row.uuid, category=row.category, name=row.name,
+                                           description=row.description, price=row.price, image=row.image,
+                                           quantity=row.quantity)
+
+    @classmethod
+    async def get_item_metadata(cls, item_uuid) -> Optional[ItemMetadataModel]:
+        """item without its stock , served from the metadata cache and read from db on a miss"""
+        metadata: ItemMetadataModel = item_metadata_cache.get(str(item_uuid))
+        if metadata is None:
+            from controller.context_manager import get_db_session
+            db = get_db_session()
+            result = await db.execute(lambda_stmt(
+                lambda: select(cls.id, cls.uuid, cls.created_at, cls.updated_at, cls.is_deleted, cls.category,
+                               cls.name, cls.description, cls.price, cls.image)
+                .filter(cls.uuid == type_coerce(item_uuid, cls.uuid.type), cls.is_deleted.is_(False))))
+            row = result.first()
+            if not row:
+                return None
+            metadata = ItemMetadataModel.from_orm(row)
+            item_metadata_cache.set(str(item_uuid), metadata)
+        return metadata
 
     @classmethod
-    def decrease_item_quantity(cls, item_uuid: str, quantity_to_reduce: int) -> int:
+    async def get_item_quantity(cls, item_id: int) -> Optional[int]:
+        """live stock of an item , None if the item is missing"""
         from controller.context_manager import get_db_session
         db = get_db_session()
-        updates = db.query(cls).filter(cls.uuid == item_uuid, cls.is_deleted.is_(False)).update(
-            {cls.quantity: cls.quantity - quantity_to_reduce})
-        db.flush()
-        return updates
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls.quantity).filter(cls.id == item_id, cls.is_deleted.is_(False))))
+        return result.scalar()
 
     @classmethod
-    def increase_item_quantity(cls, item_uuid: str, quantity_to_increase: int) -> int:
+    async def reserve_item_quantity(cls, item: ItemMetadataModel, quantity_to_reserve: int) -> Optional[ItemModel]:
+        """
+        takes quantity_to_reserve out of stock in one conditional update , concurrent reservations of the same item
+        queue on its row lock and each one re-checks the stock left by the previous one , so stock never goes negative
+        :return: item with the stock left after reserving , None if the item is missing or has not enough stock
+        """
         from controller.context_manager import get_db_session
         db = get_db_session()
-        updates = db.query(cls).filter(cls.uuid == item_uuid, cls.is_deleted.is_(False)).update(
-            {cls.quantity: cls.quantity + quantity_to_increase})
-        db.flush()
-        return updates
+        item_id = item.id
+        result = await db.execute(lambda_stmt(
+            lambda: update(cls.__table__)
+            .where(cls.id == item_id, cls.is_deleted.is_(False), cls.quantity >= quantity_to_reserve)
+            .values(quantity=cls.quantity - quantity_to_reserve)
+            .returning(cls.quantity)))
+        quantity = result.scalar()
+        if quantity is None:
+            return None
+        return item.build_item_model(quantity)
 
     @classmethod
-    def get_by_name_and_category(cls, name: str, category: str) -> ItemModel:
+    async def increase_item_quantity(cls, item_uuid: str, quantity_to_increase: int) -> int:
         from controller.context_manager import get_db_session
         db = get_db_session()
-        item = db.query(cls).filter(cls.name == name, cls.category == category, cls.is_deleted.is_(False)).first()
+        result = await db.execute(update(cls).filter(cls.uuid == item_uuid, cls.is_deleted.is_(False)).values(
+            {cls.quantity: cls.quantity + quantity_to_increase}))
+        await db.flush()
+        return result.rowcount
+
+    @classmethod
+    async def get_by_name_and_category(cls, name: str, category: str) -> ItemModel:
+        from controller.context_manager import get_db_session
+        db = get_db_session()
+        result = await db.execute(lambda_stmt(
+            lambda: select(cls).filter(cls.name == name, cls.category == category, cls.is_deleted.is_(False))))
+        item = result.scalars().first()
         return item.__to_model() if item else None
+
+    @classmethod
+    async def stream_items(cls, batch_size: int) -> AsyncIterator[List[dict]]:
+        """
+        streams all items in batches through a server side cursor , only one batch is held in memory at a time.
+        uses its own session as the stream is consumed after the request handler has returned , the session only
+        reads so it is a read only session , served by the replica when one is configured
+        """
+        columns = [cls.uuid, cls.category, cls.name, cls.description, cls.price, cls.image, cls.quantity,
+                   cls.created_at, cls.updated_at]
+        async with SessionLocal(info={SESSION_INFO_USE_REPLICA: True, SESSION_INFO_READ_ONLY: True}) as db:
+            result = await db.stream(select(*columns).filter(cls.is_deleted.is_(False)).order_by(cls.id)
+                                     .execution_options(max_row_buffer=batch_size))
+            async for rows in result.mappings().partitions(batch_size):
+                yield [dict(row) for row in rows]
+
+    @staticmethod
+    async def invalidate_metadata_after_commit(db: AsyncSession, item_uuids: List[str]):
+        """
+        drops the cached metadata of the items once db commits , in this worker right away and in the others when
+        the notification sent with the transaction arrives. dropping it before the commit would let a concurrent
+        read cache the old row again
+        """
+        payload = []
+        for item_uuid in item_uuids:
+            if payload and len(" ".join(payload + [item_uuid])) > MAX_NOTIFY_PAYLOAD_BYTES:
+                await notify(ITEM_CHANGED_CHANNEL, " ".join(payload), db=db)
+                payload = []
+            payload.append(item_uuid)
+        await notify(ITEM_CHANGED_CHANNEL, " ".join(payload), db=db)
+
+        async def invalidate():
+            invalidate_item_metadata(" ".join(item_uuids))
+        run_after_commit(db, invalidate)
+
+    @classmethod
+    def get_max_bulk_upsert_rows(cls) -> int:
+        """most rows bulk_upsert_items takes at once , every row binds at most one parameter per column"""
+        return POSTGRES_MAX_BIND_PARAMS // len(cls.__table__.columns)
+
+    @classmethod
+    async def bulk_upsert_items(cls, items: List[dict], update_existing: bool) -> List[Tuple[str, str, bool]]:
+        """
+        inserts all items in one multi row statement , items matching a live item on (name, category)
+        get their price , description , image and quantity updated or are left untouched.
+        runs and commits in its own session , so the rows written are not kept locked while the caller goes on
+        :param items: ItemInsertModel dicts , at most one per (name, category) and at most get_max_bulk_upsert_rows
+        :param update_existing: update or skip conflicting items
+        :return: (name, category, created) of every row written , skipped rows are not returned
+        """
+        statement = insert(cls.__table__).values(items)
+        conflict_target = dict(index_elements=[cls.name, cls.category], index_where=cls.is_deleted.is_(False))
+        if update_existing:
+            statement = statement.on_conflict_do_update(
+                **conflict_target, set_={column: statement.excluded[column] for column in
+                                         ('price', 'description', 'image', 'quantity', 'updated_at')})
+        else:
+            statement = statement.on_conflict_do_nothing(**conflict_target)
+        async with SessionLocal() as db:
+            # xmax is 0 only for freshly inserted rows , it tells the inserted rows from the updated ones
+            result = await db.execute(statement.returning(cls.uuid, cls.name, cls.category,
+                                                          literal_column("xmax = 0")))
+            written, updated_uuids = [], []
+            for item_uuid, name, category, created in result.all():
+                if not created:
+                    updated_uuids.append(str(item_uuid))
+                written.append((name, category, created))
+            if updated_uuids:
+                await cls.invalidate_metadata_after_commit(db, updated_uuids)
+            if written:
+                InventoryVersion.bump_version_after_commit(db)
+            await end_db_session(db)
+        return written
+
+
+def invalidate_item_metadata(item_uuids: str):
+    """:param item_uuids: space separated item uuids , the payload of ITEM_CHANGED_CHANNEL"""
+    for item_uuid in item_uuids.split():
+        item_metadata_cache.invalidate(item_uuid)
+
+
+notification_listener.add_handler(ITEM_CHANGED_CHANNEL, invalidate_item_metadata,
+                                  resync_handler=item_metadata_cache.clear)
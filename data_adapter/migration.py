@@ -0,0 +1,183 @@
+"""
+versioned schema migrations
+
+migrations are plain sql files in scripts/migrations named as <version>_<description>.sql , they are applied in
+version order and every applied version is recorded in the schema_migrations table.
+a migration file starting with the line `-- migrate:no-transaction` is executed outside of a transaction , this is
+required for statements like CREATE INDEX CONCURRENTLY.
+a failed or interrupted concurrent index build leaves an INVALID index behind , so before every concurrent build the
+runner drops such a leftover and after the build it verifies the index is valid before running the next statement.
+
+run from cli with `python -m data_adapter.migration` , the launcher runs them the same way before forking the
+workers. on app startup (DB_RUN_MIGRATIONS_ON_STARTUP) only the
+transactional migrations are applied , a worker must not spend its startup timeout building indexes
+"""
+import asyncio
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from logger import logger
+from utils.exceptions import MigrationException
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'migrations')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(\w+)\.sql$')
+NO_TRANSACTION_MARKER = '-- migrate:no-transaction'
+CONCURRENT_INDEX_PATTERN = re.compile(
+    r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)', re.IGNORECASE)
+# arbitrary key for the postgres advisory lock , so that only one worker applies migrations at a time
+MIGRATION_LOCK_KEY = 7305014952
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version int4 NOT NULL,
+    "name" varchar(255) NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now(),
+    CONSTRAINT schema_migrations_pk PRIMARY KEY (version)
+)"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: List[str]
+    in_transaction: bool
+
+
+def split_sql_statements(sql: str) -> List[str]:
+    """splits a sql script on `;` , ignoring `--` comments as well as `;` inside quotes and dollar quoted bodies"""
+    statements, current, index = [], [], 0
+    while index < len(sql):
+        char = sql[index]
+        if sql.startswith('--', index):
+            end = sql.find('\n', index)
+            index = len(sql) if end == -1 else end
+            continue
+        if char == "'" or sql.startswith('$$', index):
+            quote = "'" if char == "'" else '$$'
+            end = sql.find(quote, index + len(quote))
+            end = len(sql) if end == -1 else end + len(quote)
+            current.append(sql[index:end])
+            index = end
+            continue
+        if char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        index += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def load_migrations(migrations_dir: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for file_name in os.listdir(migrations_dir):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        with open(os.path.join(migrations_dir, file_name)) as migration_file:
+            sql = migration_file.read()
+        migrations.append(Migration(version=int(match.group(1)), name=match.group(2),
+                                    statements=split_sql_statements(sql),
+                                    in_transaction=not sql.lstrip().startswith(NO_TRANSACTION_MARKER)))
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"duplicate migration versions found in {migrations_dir}")
+    return migrations
+
+
+async def run_migrations(engine: AsyncEngine = None, migrations_dir: str = MIGRATIONS_DIR,
+                         concurrent: bool = True) -> List[int]:
+    """
+    apply all pending migrations
+    :param concurrent: when false , stop at the first pending no-transaction migration instead of applying it
+    :return: versions applied in this run
+    """
+    if engine is None:
+        from data_adapter.db import db_engine
+        engine = db_engine
+    applied_now = []
+    async with engine.connect() as lock_connection:
+        # session level lock , held until released below even though the migrations run on other connections.
+        # the lock connection is in autocommit as an idle open transaction would block CREATE INDEX CONCURRENTLY
+        lock_connection = await lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(text(CREATE_MIGRATIONS_TABLE))
+                applied = set((await connection.execute(text("SELECT version FROM public.schema_migrations")))
+                              .scalars().all())
+            for migration in load_migrations(migrations_dir):
+                if migration.version in applied:
+                    continue
+                if not migration.in_transaction and not concurrent:
+                    # later migrations may depend on this one , so nothing after it is applied either
+                    logger.warning(f"MIGRATION::{migration.version}_{migration.name} has to run outside of a "
+                                   f"transaction , apply it with `python -m data_adapter.migration`")
+                    break
+                logger.info(f"MIGRATION::applying {migration.version}_{migration.name}")
+                if migration.in_transaction:
+                    async with engine.begin() as connection:
+                        for statement in migration.statements:
+                            await connection.exec_driver_sql(statement)
+                        await _record_migration(connection, migration)
+                else:
+                    async with engine.connect() as connection:
+                        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+                        for statement in migration.statements:
+                            await _run_no_transaction_statement(connection, statement)
+                        await _record_migration(connection, migration)
+                applied_now.append(migration.version)
+        finally:
+            await lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    logger.info(f"MIGRATION::schema up to date , applied {applied_now or 'nothing'}")
+    return applied_now
+
+
+async def _run_no_transaction_statement(connection, statement: str):
+    match = CONCURRENT_INDEX_PATTERN.match(statement)
+    if match is None:
+        await connection.exec_driver_sql(statement)
+        return
+    index_name = match.group(1)
+    # IF NOT EXISTS would otherwise skip the build and keep an invalid index left over by an earlier failed run
+    if await _index_is_valid(connection, index_name) is False:
+        logger.warning(f"MIGRATION::dropping invalid index {index_name} left by an earlier build")
+        await connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+    try:
+        await connection.exec_driver_sql(statement)
+    except Exception:
+        # an invalid index is still maintained on every write , do not keep it around until the next run
+        await connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+        raise
+    if not await _index_is_valid(connection, index_name):
+        raise MigrationException(message=f"index {index_name} is missing or invalid after it was built")
+
+
+async def _index_is_valid(connection, index_name: str) -> Optional[bool]:
+    """:return: None if the index does not exist , else whether postgres considers it valid"""
+    result = await connection.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                                      {"name": index_name})
+    return result.scalar()
+
+
+async def _record_migration(connection, migration: Migration):
+    await connection.execute(text('INSERT INTO public.schema_migrations (version, "name") VALUES (:version, :name)'),
+                             {"version": migration.version, "name": migration.name})
+
+
+async def main():
+    from data_adapter.db import db_engine
+    try:
+        await run_migrations(db_engine)
+    finally:
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import asyncio
+import inspect
+from typing import Awaitable, Callable, Dict, List, Union
+
+import asyncpg
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import DB
+from logger import logger
+
+# channel notified with the uuid of a user whose role or status may have changed
+USER_CHANGED_CHANNEL = 'cart_user_changed'
+# channel notified with the uuid of a user whose tokens are revoked and the unix time they were revoked at
+USER_REVOKED_CHANNEL = 'cart_user_revoked'
+# channel notified with the new inventory version once a change to items has committed
+INVENTORY_CHANGED_CHANNEL = 'cart_inventory_changed'
+# channel notified with the space separated uuids of items whose metadata changed
+ITEM_CHANGED_CHANNEL = 'cart_item_changed'
+# postgres rejects notification payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD_BYTES = 7999
+
+
+async def notify(channel: str, payload: str, db: AsyncSession = None):
+    """
+    notifies every worker listening on the channel , the notification is sent with the request transaction , or the
+    transaction of db when given , so it is delivered only once the transaction commits and never if it rolls back
+    """
+    if db is None:
+        from controller.context_manager import get_db_session
+        db = get_db_session()
+    await db.execute(select(func.pg_notify(channel, payload)))
+
+
+class NotificationListener:
+    """
+    listens on postgres channels over one dedicated connection , kept out of the pool , and passes the payload of
+    every notification to the handlers of its channel. every worker process runs its own listener.
+    notifications sent while the connection is down are lost , so the resync handlers run every time the listener
+    (re)connects , they drop whatever state the lost notifications would have invalidated , or reload it
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._resync_handlers: List[Callable[[], Union[None, Awaitable]]] = []
+        self._task: asyncio.Task = None
+
+    def add_handler(self, channel: str, handler: Callable[[str], None],
+                    resync_handler: Callable[[], Union[None, Awaitable]] = None):
+        self._handlers.setdefault(channel, []).append(handler)
+        if resync_handler:
+            self._resync_handlers.append(resync_handler)
+
+    def start(self):
+        if self._task is None and self._handlers:
+            self._task = asyncio.get_event_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def dispatch(self, channel: str, payload: str):
+        """runs the handlers of the channel in this worker , for notifications it must not wait for"""
+        self._dispatch(None, None, channel, payload)
+
+    def _dispatch(self, connection, pid, channel: str, payload: str):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"NOTIFY::handler failed on channel {channel} error : {e}")
+
+    async def _listen(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(host=DB.host, port=DB.port, user=DB.user, password=DB.pass_,
+                                                   database=DB.name)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                for channel in self._handlers:
+                    await connection.add_listener(channel, self._dispatch)
+                for resync_handler in self._resync_handlers:
+                    resynced = resync_handler()
+                    if inspect.isawaitable(resynced):
+                        await resynced
+                logger.info(f"NOTIFY::listening on {list(self._handlers)}")
+                # a connection dropped without a close is only noticed when used , so it is checked periodically
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=DB.notify_listener_check_seconds)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(connection.execute("select 1"),
+                                               timeout=DB.notify_listener_check_seconds)
+                logger.error("NOTIFY::listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"NOTIFY::listener failed error : {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(DB.notify_listener_retry_seconds)
+
+
+notification_listener = NotificationListener()
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import List
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolCheckoutStats:
+    """Collects connection checkout wait times of the pool as a cumulative histogram"""
+    # upper bounds of the wait time buckets in milliseconds , last bucket collects everything above
+    BUCKETS_MS: List[float] = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            for index, upper_bound in enumerate(self.BUCKETS_MS):
+                if wait_ms <= upper_bound:
+                    self.bucket_counts[index] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            labels = [f"le_{bucket}ms" for bucket in self.BUCKETS_MS] + ["inf"]
+            return {"checkouts": self.checkouts,
+                    "timeouts": self.timeouts,
+                    "avg_wait_ms": round(self.total_wait_ms / max(self.checkouts + self.timeouts, 1), 3),
+                    "max_wait_ms": round(self.max_wait_ms, 3),
+                    "wait_ms_histogram": dict(zip(labels, self.bucket_counts))}
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """asyncio queue pool which records how long every connection checkout had to wait , every pool on its own"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = PoolCheckoutStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        # the stats survive the pool re-creation of engine.dispose
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.checkout_stats.record((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        self.checkout_stats.record((time.perf_counter() - start) * 1000)
+        return connection
+
+    def stats(self) -> dict:
+        """live pool usage along with the checkout wait stats"""
+        return {"size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "timeout_seconds": self._timeout,
+                **self.checkout_stats.to_dict()}
@@ -0,0 +1,53 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class DBQueryStats:
+    """Statements executed and time spent waiting on the db , collected per request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time_ms = 0.0
+
+    def record(self, elapsed_ms: float):
+        self.queries += 1
+        self.db_time_ms += elapsed_ms
+
+
+def _current_stats() -> DBQueryStats:
+    from controller.context_manager import context_db_query_stats
+    return context_db_query_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    stats = _current_stats()
+    if stats is not None:
+        stats.record(elapsed_ms)
+
+
+def _handle_error(exception_context):
+    # failed statements count as well , and their start time must not be left behind on the connection
+    connection = exception_context.connection
+    if connection is None or not connection.info.get("query_start_time"):
+        return
+    elapsed_ms = (time.perf_counter() - connection.info["query_start_time"].pop()) * 1000
+    stats = _current_stats()
+    if stats is not None:
+        stats.record(elapsed_ms)
+
+
+def instrument_query_stats(engine: Engine):
+    """
+    records every statement run on the engine into the DBQueryStats of the current request context.
+    for async engines pass the sync_engine , the events fire inside the greenlet which shares the request context
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
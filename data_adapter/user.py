@@ -1,8 +1,21 @@
-from sqlalchemy import Column, String
+import time
+from datetime import timedelta
+from typing import Optional
 
-from sqlalchemy.orm import Session
-from data_adapter.db import CartDBBase, DBBase
-from models.user import UserModel, UserStatus, UserRole
+from sqlalchemy import Column, String, select, update, lambda_stmt, type_coerce, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import Auth, JWTToken
+from data_adapter.db import CartDBBase, DBBase, SessionLocal, run_after_commit, time_now
+from data_adapter.notifications import notification_listener, notify, USER_CHANGED_CHANNEL, USER_REVOKED_CHANNEL
+from models.user import UserModel, UserStatus, UserRole, UserStatusModel
+from utils.cache import LRUTTLCache, RevocationList
+
+# role and status of users by user uuid , dropped by updates of any worker through USER_CHANGED_CHANNEL
+user_status_cache = LRUTTLCache(max_size=Auth.user_status_cache_size, ttl_seconds=Auth.user_status_cache_ttl_seconds)
+# users whose tokens are revoked by user uuid , checked instead of the user status in stateless auth mode. an entry
+# has to outlive the access tokens issued before it
+revoked_users = RevocationList(ttl_seconds=int(JWTToken.access_token_expire_minutes) * 60)
 
 
 class User(DBBase, CartDBBase):
@@ -20,38 +33,99 @@ class User(DBBase, CartDBBase):
         return UserModel.from_orm(self)
 
     @classmethod
-    def create_user(cls, user) -> UserModel:
+    async def create_user(cls, user) -> UserModel:
         from controller.context_manager import get_db_session
-        db: Session = get_db_session()
+        db: AsyncSession = get_db_session()
         db.add(user)
-        db.flush()
+        await db.flush()
         return user.__to_model()
 
     @classmethod
-    def get_by_id(cls, id) -> UserModel:
-        user = super().get_by_id(id)
+    async def get_by_id(cls, id) -> UserModel:
+        user = await super().get_by_id(id)
         return user.__to_model() if user else None
 
     @classmethod
-    def get_by_uuid(cls, uuid) -> UserModel:
-        user = super().get_by_uuid(uuid)
+    async def get_by_uuid(cls, uuid) -> UserModel:
+        user = await super().get_by_uuid(uuid)
         return user.__to_model() if user else None
 
     @classmethod
-    def get_active_user_by_email(cls, email) -> UserModel:
+    async def get_active_user_by_email(cls, email) -> UserModel:
         from controller.context_manager import get_db_session
         db = get_db_session()
-        user = db.query(cls).filter(cls.email == email, cls.status == UserStatus.ACTIVE,
-                                    cls.is_deleted.is_(False)).first()
+        result = await db.execute(lambda_stmt(lambda: select(cls).filter(
+            cls.email == email, cls.status == UserStatus.ACTIVE, cls.is_deleted.is_(False))))
+        user = result.scalars().first()
         return user.__to_model() if user else None
 
     @classmethod
-    def update_user_by_uuid(cls, user_uuid: str, update_dict: dict, user_role: UserRole = None) -> int:
+    async def get_status_by_uuid(cls, user_uuid) -> Optional[UserStatusModel]:
+        """role and status of a user , served from the user status cache and read from db on a miss"""
+        user_status: UserStatusModel = user_status_cache.get(cls.status_cache_key(user_uuid))
+        if user_status is None:
+            from controller.context_manager import get_db_session
+            db = get_db_session()
+            result = await db.execute(lambda_stmt(lambda: select(cls.role, cls.status).filter(
+                cls.uuid == type_coerce(user_uuid, cls.uuid.type), cls.is_deleted.is_(False))))
+            row = result.first()
+            if not row:
+                return None
+            user_status = UserStatusModel(role=row.role, status=row.status)
+            user_status_cache.set(cls.status_cache_key(user_uuid), user_status)
+        return user_status
+
+    @staticmethod
+    def status_cache_key(user_uuid) -> str:
+        return str(user_uuid).lower()
+
+    @classmethod
+    async def update_user_by_uuid(cls, user_uuid: str, update_dict: dict, user_role: UserRole = None) -> int:
         from controller.context_manager import get_db_session
         db = get_db_session()
-        update_query = db.query(cls).filter(cls.uuid == user_uuid, cls.is_deleted.is_(False))
+        update_query = update(cls).filter(cls.uuid == user_uuid, cls.is_deleted.is_(False))
         if user_role:
             update_query = update_query.filter(cls.role == user_role)
-        updates = update_query.update(update_dict)
-        db.flush()
-        return updates
+        result = await db.execute(update_query.values(update_dict))
+        await db.flush()
+        if result.rowcount:
+            # dropped here right away , and in every worker once the update commits
+            user_status_cache.invalidate(cls.status_cache_key(user_uuid))
+            await notify(USER_CHANGED_CHANNEL, cls.status_cache_key(user_uuid))
+        return result.rowcount
+
+    @classmethod
+    async def revoke_tokens(cls, user_uuid: str):
+        """revokes every token issued to the user so far , in every worker once the request transaction commits"""
+        from controller.context_manager import get_db_session
+        payload = f"{cls.status_cache_key(user_uuid)} {time.time()}"
+        await notify(USER_REVOKED_CHANNEL, payload)
+
+        async def revoke_in_this_worker():
+            notification_listener.dispatch(USER_REVOKED_CHANNEL, payload)
+        run_after_commit(get_db_session(), revoke_in_this_worker)
+
+    @classmethod
+    async def reload_revoked_users(cls):
+        """
+        revokes the tokens of users suspended or deleted within the lifetime of an access token , as of their last
+        update. reads with a session of its own as it runs outside of requests
+        """
+        updated_since = time_now() - timedelta(seconds=revoked_users.ttl_seconds)
+        async with SessionLocal() as db:
+            result = await db.execute(select(cls.uuid, cls.updated_at).filter(
+                or_(cls.status != UserStatus.ACTIVE, cls.is_deleted.is_(True)), cls.updated_at >= updated_since))
+            rows = result.all()
+        for row in rows:
+            revoked_users.revoke(cls.status_cache_key(row.uuid), row.updated_at.timestamp())
+
+
+def revoke_user(payload: str):
+    user_uuid, revoked_at = payload.split()
+    revoked_users.revoke(user_uuid, float(revoked_at))
+
+
+notification_listener.add_handler(USER_CHANGED_CHANNEL, lambda user_uuid: user_status_cache.invalidate(user_uuid),
+                                  resync_handler=user_status_cache.clear)
+if Auth.stateless_enabled:
+    notification_listener.add_handler(USER_REVOKED_CHANNEL, revoke_user, resync_handler=User.reload_revoked_users)
@@ -6,7 +6,7 @@ echo "App run command args: $@"
 
 run_service() {
   echo "Generated config, starting cart app..."
-  env $(cat /code/config/.env | xargs) /usr/local/bin/uvicorn server.app:app --host=0.0.0.0 --port=9999 --workers=4
+  env $(cat /code/config/.env | xargs) python -m server.launcher
 }
 
 run_service
\ No newline at end of file
@@ -1,3 +1,5 @@
+import base64
+import json
 from datetime import datetime
 from typing import Optional, Any
 from uuid import UUID
@@ -24,3 +26,23 @@ class DBBaseModel(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class KeysetCursor(BaseModel):
+    """Opaque cursor for keyset pagination , points to the last row of the previous page"""
+    created_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(json.dumps([self.created_at.isoformat(), self.id]).encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "KeysetCursor":
+        """
+        :raises ValueError: if the cursor is not a valid one
+        """
+        try:
+            created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError(f"invalid cursor {cursor}")
+        return cls(created_at=created_at, id=id)
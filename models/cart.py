@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, validator
@@ -53,10 +53,20 @@ class CartModel(DBBaseModel, BaseModel):
     cart_items: List[CartItemModel] = []
     customer: UserModel
     customer_id: int
+    #  computed by the db when the cart is read , otherwise from the cart items
+    total_price: Optional[float] = None
 
-    @property
-    def total_price(self) -> float:
-        return sum([item.original_item.price*item.quantity_in_cart for item in self.cart_items])
+    @validator('total_price', always=True)
+    def compute_total_price(cls, v, values):
+        return v if v is not None else cls.sum_cart_items(values.get('cart_items', []))
+
+    @staticmethod
+    def sum_cart_items(cart_items: List[CartItemModel]) -> float:
+        return sum([item.original_item.price*item.quantity_in_cart for item in cart_items])
+
+    def refresh_total_price(self):
+        """recomputes total price after cart items are changed in memory"""
+        self.total_price = self.sum_cart_items(self.cart_items)
 
     class Config:
         orm_mode = True
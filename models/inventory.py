@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional
+from typing import Optional, List
 from uuid import UUID
 
 from pydantic import BaseModel, validator, HttpUrl, constr
@@ -59,3 +59,55 @@ class ItemModel(ItemInsertModel, DBBaseModel):
 
     def build_response_model(self) -> ItemResponseModel:
         return ItemResponseModel(**self.dict())
+
+
+class ItemMetadataModel(ItemBaseModel, DBBaseModel):
+    """Item without its stock , the part of an item that rarely changes"""
+
+    class Config:
+        orm_mode = True
+
+    def build_item_model(self, quantity: int) -> ItemModel:
+        return ItemModel.construct(**self.dict(), quantity=quantity)
+
+
+class ExportFormat(str, Enum):
+    """Inventory export and import formats"""
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
+class ItemFilterModel(BaseModel):
+    """Filters for inventory listing"""
+    category: Optional[ItemCategory] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = False
+
+
+class ItemPageResponseModel(BaseModel):
+    """One page of inventory listing , next_cursor is None on the last page"""
+    items: List[ItemResponseModel] = []
+    next_cursor: Optional[str] = None
+
+
+class ImportConflictAction(str, Enum):
+    """What the bulk import does with rows matching a live item on (name, category)"""
+    SKIP = 'skip'
+    UPDATE = 'update'
+
+
+class ItemImportRowErrorModel(BaseModel):
+    """Errors of one rejected import row , rows are numbered from 1 excluding the csv header"""
+    row: int
+    errors: List[str]
+
+
+class ItemImportReportModel(BaseModel):
+    """Outcome of a bulk import"""
+    received: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[ItemImportRowErrorModel] = []
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel, validator, EmailStr
@@ -23,6 +24,14 @@ class UserTokenData(BaseModel):
     uuid: str
     role: UserRole
     email: EmailStr
+    #  unix time the token was issued at , set when the token is created
+    iat: Optional[float] = None
+
+
+class UserStatusModel(BaseModel):
+    """Role and status of a user , all that is checked for the user of a token"""
+    role: UserRole
+    status: UserStatus
 
 
 class UserResponseModel(BaseModel):
@@ -99,6 +108,11 @@ class UserLoginModel(BaseModel):
     password: str
 
 
+class RefreshTokenModel(BaseModel):
+    """Refresh token request model"""
+    refresh_token: str
+
+
 class TokenType(str, Enum):
     bearer = "bearer"
 
@@ -107,6 +121,7 @@ class UserTokenResponseModel(BaseModel):
     """User token model"""
     user_uuid: UUID
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: TokenType = TokenType.bearer
     user_role: UserRole
     user_status: UserStatus
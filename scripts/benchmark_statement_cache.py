@@ -0,0 +1,125 @@
+"""
+Per call statement overhead of the hot data adapter lookups , before and after moving them to lambda statements.
+
+Both run against a stub session which prepares every statement it receives the way the engine does before the db
+round trip : it generates the cache key , looks the compiled form up in a compiled cache sized like the default one
+of the engine , compiling on a miss , then binds the parameters of the call. The db round trip is the same for both
+and is left out , the stub answers every query with an empty result.
+
+- select() : the plain select() statements the adapters ran before , kept here as they were
+- lambda : the adapter methods as they are
+
+usage: python -m scripts.benchmark_statement_cache [iterations]
+"""
+import asyncio
+import sys
+import time
+import uuid
+
+from sqlalchemy import select, and_, func
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.orm import contains_eager, with_expression
+from sqlalchemy.util import LRUCache
+
+from controller.context_manager import context_db_session, get_db_session
+from data_adapter.cart import CustomerCart, CartItem
+from data_adapter.inventory import Item
+from data_adapter.user import User
+from models.user import UserStatus
+
+# query_cache_size default of create_engine
+ENGINE_COMPILED_CACHE_SIZE = 500
+
+
+class EmptyResult:
+    """result of a query matching nothing"""
+
+    def scalars(self):
+        return self
+
+    def unique(self):
+        return self
+
+    def first(self):
+        return None
+
+
+class CompilingSession:
+    """stands in for the request session , prepares the statements it receives and runs none of them"""
+
+    def __init__(self):
+        self.dialect = asyncpg_dialect()
+        self.compiled_cache = LRUCache(ENGINE_COMPILED_CACHE_SIZE)
+
+    async def execute(self, statement, params=None):
+        # the same steps the connection takes
+        compiled, extracted_params, _ = statement._compile_w_cache(dialect=self.dialect,
+                                                                   compiled_cache=self.compiled_cache,
+                                                                   column_keys=[])
+        compiled.construct_params(params, extracted_parameters=extracted_params)
+        return EmptyResult()
+
+
+async def select_get_by_uuid(cls, value):
+    result = await get_db_session().execute(select(cls).filter(cls.uuid == value, cls.is_deleted.is_(False)))
+    return result.scalars().first()
+
+
+async def select_get_active_user_by_email(email):
+    result = await get_db_session().execute(select(User).filter(
+        User.email == email, User.status == UserStatus.ACTIVE, User.is_deleted.is_(False)))
+    return result.scalars().first()
+
+
+async def select_get_by_name_and_category(name, category):
+    result = await get_db_session().execute(select(Item).filter(
+        Item.name == name, Item.category == category, Item.is_deleted.is_(False)))
+    return result.scalars().first()
+
+
+async def select_get_by_customer_uuid(customer_uuid):
+    total_price = func.coalesce(func.sum(Item.price * CartItem.quantity_in_cart).over(partition_by=CustomerCart.id), 0)
+    result = await get_db_session().execute(
+        select(CustomerCart).join(CustomerCart.customer)
+        .outerjoin(CartItem, and_(CartItem.cart_id == CustomerCart.id, CartItem.is_deleted.is_(False)))
+        .outerjoin(Item, Item.id == CartItem.item_id)
+        .filter(User.uuid == customer_uuid, CustomerCart.is_deleted.is_(False))
+        .order_by(CustomerCart.id, CartItem.id)
+        .options(contains_eager(CustomerCart.customer),
+                 contains_eager(CustomerCart.cart_items).contains_eager(CartItem.original_item),
+                 with_expression(CustomerCart.total_price, total_price)))
+    return result.unique().scalars().first()
+
+
+BENCHMARKS = [
+    ("CartDBBase.get_by_uuid", lambda: select_get_by_uuid(Item, str(uuid.uuid4())),
+     lambda: Item.get_by_uuid(str(uuid.uuid4()))),
+    ("User.get_active_user_by_email", lambda: select_get_active_user_by_email("john@example.com"),
+     lambda: User.get_active_user_by_email("john@example.com")),
+    ("Item.get_by_name_and_category", lambda: select_get_by_name_and_category("Laptop", "electronics"),
+     lambda: Item.get_by_name_and_category("Laptop", "electronics")),
+    ("CustomerCart.get_by_customer_uuid", lambda: select_get_by_customer_uuid(str(uuid.uuid4())),
+     lambda: CustomerCart.get_by_customer_uuid(str(uuid.uuid4()))),
+]
+
+
+async def per_call_us(call, iterations: int) -> float:
+    """time a lookup takes to build and prepare its statement , once its compiled form is cached"""
+    context_db_session.set(CompilingSession())
+    await call()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(iterations: int):
+    print(f"{'query':<36}{'select() us/call':>18}{'lambda us/call':>16}{'speedup':>9}")
+    for name, plain, cached in BENCHMARKS:
+        plain_us = await per_call_us(plain, iterations)
+        cached_us = await per_call_us(cached, iterations)
+        print(f"{name:<36}{plain_us:>18.1f}{cached_us:>16.1f}{plain_us / cached_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -64,4 +64,38 @@ CREATE TABLE public.cart_item (
 	CONSTRAINT cart_item_un UNIQUE (uuid),
 	CONSTRAINT cart_item_fk FOREIGN KEY (cart_id) REFERENCES public.customer_cart(id),
 	CONSTRAINT cart_item_fk_1 FOREIGN KEY (item_id) REFERENCES public.item(id)
-);
\ No newline at end of file
+);
+
+-- the schema of every migration in scripts/migrations , a fresh database starts fully migrated. app workers only
+-- apply transactional migrations on startup , the concurrent index builds would otherwise wait for the cli.
+-- keep in sync when adding a migration
+CREATE INDEX customer_cart_customer_id_idx ON public.customer_cart (customer_id) WHERE is_deleted IS false;
+CREATE INDEX cart_item_cart_id_idx ON public.cart_item (cart_id) WHERE is_deleted IS false;
+CREATE INDEX cart_item_item_id_idx ON public.cart_item (item_id) WHERE is_deleted IS false;
+CREATE INDEX item_created_at_id_idx ON public.item (created_at, id) WHERE is_deleted IS false;
+CREATE INDEX item_category_created_at_id_idx ON public.item (category, created_at, id) WHERE is_deleted IS false;
+CREATE INDEX item_in_stock_created_at_id_idx ON public.item (created_at, id) WHERE is_deleted IS false AND quantity > 0;
+CREATE UNIQUE INDEX item_name_category_uniq_idx ON public.item ("name", category) WHERE is_deleted IS false;
+CREATE INDEX item_updated_at_idx ON public.item (updated_at);
+
+-- inventory version table
+CREATE TABLE public.inventory_version (
+	id int4 NOT NULL,
+	"version" int8 NOT NULL DEFAULT 0,
+	CONSTRAINT inventory_version_pk PRIMARY KEY (id)
+);
+INSERT INTO public.inventory_version (id, "version") VALUES (1, 0);
+
+-- schema migrations table , with the migrations applied above
+CREATE TABLE public.schema_migrations (
+	version int4 NOT NULL,
+	"name" varchar(255) NOT NULL,
+	applied_at timestamptz NOT NULL DEFAULT now(),
+	CONSTRAINT schema_migrations_pk PRIMARY KEY (version)
+);
+INSERT INTO public.schema_migrations (version, "name") VALUES
+	(1, 'hot_path_indexes'),
+	(2, 'item_listing_indexes'),
+	(3, 'item_name_category_unique'),
+	(4, 'inventory_version'),
+	(5, 'item_updated_at_index');
@@ -0,0 +1,19 @@
+-- migrate:no-transaction
+-- indexes for the hot lookups of cart and inventory , built concurrently so that existing deployments are not
+-- blocked for writes while they are created. all of them skip soft deleted rows as every query filters them out
+
+-- CustomerCart.get_by_customer_uuid
+CREATE INDEX CONCURRENTLY IF NOT EXISTS customer_cart_customer_id_idx
+    ON public.customer_cart (customer_id) WHERE is_deleted IS false;
+
+-- cart join from customer_cart to cart_item
+CREATE INDEX CONCURRENTLY IF NOT EXISTS cart_item_cart_id_idx
+    ON public.cart_item (cart_id) WHERE is_deleted IS false;
+
+-- cart_item to item lookups
+CREATE INDEX CONCURRENTLY IF NOT EXISTS cart_item_item_id_idx
+    ON public.cart_item (item_id) WHERE is_deleted IS false;
+
+-- Item.get_by_name_and_category
+CREATE INDEX CONCURRENTLY IF NOT EXISTS item_name_category_idx
+    ON public.item ("name", category) WHERE is_deleted IS false;
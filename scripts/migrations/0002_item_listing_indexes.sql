@@ -0,0 +1,13 @@
+-- migrate:no-transaction
+-- indexes backing the keyset paginated inventory listing ordered by (created_at, id)
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS item_created_at_id_idx
+    ON public.item (created_at, id) WHERE is_deleted IS false;
+
+-- listing filtered by category
+CREATE INDEX CONCURRENTLY IF NOT EXISTS item_category_created_at_id_idx
+    ON public.item (category, created_at, id) WHERE is_deleted IS false;
+
+-- listing of in stock items only
+CREATE INDEX CONCURRENTLY IF NOT EXISTS item_in_stock_created_at_id_idx
+    ON public.item (created_at, id) WHERE is_deleted IS false AND quantity > 0;
@@ -0,0 +1,9 @@
+-- migrate:no-transaction
+-- one live item per (name, category) , the conflict target of the bulk inventory import.
+-- duplicated live items have to be cleaned up before this migration can build the index
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS item_name_category_uniq_idx
+    ON public.item ("name", category) WHERE is_deleted IS false;
+
+-- the unique index serves the same lookups
+DROP INDEX CONCURRENTLY IF EXISTS item_name_category_idx;
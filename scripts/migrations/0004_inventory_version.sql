@@ -0,0 +1,10 @@
+-- version of the inventory catalog , bumped after every committed change to item rows. it backs the ETag of the
+-- inventory listing , a single row read is enough to tell if the catalog changed since a client last fetched it
+
+CREATE TABLE IF NOT EXISTS public.inventory_version (
+	id int4 NOT NULL,
+	"version" int8 NOT NULL DEFAULT 0,
+	CONSTRAINT inventory_version_pk PRIMARY KEY (id)
+);
+
+INSERT INTO public.inventory_version (id, "version") VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
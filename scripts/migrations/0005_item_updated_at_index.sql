@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- latest item write , stock changes included , read by the inventory listing ETag
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS item_updated_at_idx ON public.item (updated_at);
@@ -8,14 +8,22 @@ from pydantic import ValidationError
 from sqlalchemy.exc import ProgrammingError, DataError, IntegrityError
 
 from controller import status, user_controller, customer_controller, inventory_controller, cart_controller
+from config.settings import DB
 from controller.context_manager import context_log_meta, context_set_db_session_rollback
+from data_adapter.migration import run_migrations
+from data_adapter.notifications import notification_listener
 from logger import logger
 from models.base import GenericResponseModel
 from server.auth import authenticate_token
+from server.middleware import DBQueryStatsMiddleware, AuthMiddleware
 from utils.exceptions import AppException
 from utils.helper import build_api_response
+from utils.password_hasher import password_hashing_pool
 
 app = FastAPI()
+#  the last middleware added runs first , requests rejected by AuthMiddleware are still counted
+app.add_middleware(AuthMiddleware)
+app.add_middleware(DBQueryStatsMiddleware)
 
 #  register routers here and add dependency on authenticate_token if token based authentication is required
 app.include_router(status.router)
@@ -32,8 +40,8 @@ app.include_router(cart_controller.cart_router, dependencies=[Depends(authentica
 async def pydantic_validation_exception_handler(request: Request, exc):
     context_set_db_session_rollback.set(True)
     logger.error(extra=context_log_meta.get(), msg=f"data validation failed {exc.errors()}")
-    return build_api_response(GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
-                                                   error="Data Validation Failed"))
+    return await build_api_response(GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
+                                                         error="Data Validation Failed"))
 
 
 @app.exception_handler(ProgrammingError)
@@ -41,8 +49,8 @@ async def sql_exception_handler(request: Request, exc):
     context_set_db_session_rollback.set(True)
     logger.error(extra=context_log_meta.get(),
                  msg=f"sql exception occurred error: {str(exc.args)} statement : {exc.statement}")
-    return build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
-                                                   error="Data Source Error"))
+    return await build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                         error="Data Source Error"))
 
 
 @app.exception_handler(DataError)
@@ -50,8 +58,8 @@ async def sql_data_exception_handler(request, exc):
     context_set_db_session_rollback.set(True)
     logger.error(extra=context_log_meta.get(),
                  msg=f"sql data exception occurred error: {str(exc.args)} statement : {exc.statement}")
-    return build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
-                                                   error="Data Error for data provided"))
+    return await build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                         error="Data Error for data provided"))
 
 
 @app.exception_handler(AppException)
@@ -59,8 +67,8 @@ async def application_exception_handler(request, exc):
     context_set_db_session_rollback.set(True)
     logger.error(extra=context_log_meta.get(),
                  msg=f"application exception occurred error: {json.loads(str(exc))}")
-    return build_api_response(GenericResponseModel(status_code=exc.status_code,
-                                                   error=exc.message))
+    return await build_api_response(GenericResponseModel(status_code=exc.status_code,
+                                                         error=exc.message))
 
 
 @app.exception_handler(IntegrityError)
@@ -68,19 +76,26 @@ async def sql_integrity_exception_handler(request, exc):
     context_set_db_session_rollback.set(True)
     logger.error(extra=context_log_meta.get(),
                  msg=f"sql integrity exception occurred error: {str(exc.args)} statement : {exc.statement}")
-    return build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
-                                                   error="Integrity Error for data provided"))
+    return await build_api_response(GenericResponseModel(status_code=http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                         error="Integrity Error for data provided"))
 
 
 # register event handlers here
 @app.on_event("startup")
 async def startup_event():
     logger.info("Startup Event Triggered")
+    if DB.run_migrations_on_startup:
+        # concurrent index builds run from the cli or once in the launcher before the workers are forked
+        await run_migrations(concurrent=False)
+    # every worker listens for the changes made by the other workers to what it caches
+    notification_listener.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutdown Event Triggered")
+    await notification_listener.stop()
+    password_hashing_pool.shutdown()
 
 
 if __name__ == "__main__":
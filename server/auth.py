@@ -1,8 +1,11 @@
 from enum import Enum
 from functools import wraps
+from typing import FrozenSet, List, NamedTuple, Optional, Pattern
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer
+from starlette.routing import BaseRoute
 
 from controller.context_manager import context_actor_user_data
 from models.user import UserRole
@@ -13,7 +16,9 @@ from utils.jwt_token_handler import JWTHandler
 class RBACResource(str, Enum):
     customer = "customer"
     inventory = "inventory"
+    inventory_export = "inventory_export"
     cart = "cart"
+    status = "status"
 
 
 class RBACAccessType(str, Enum):
@@ -33,14 +38,20 @@ RBAC_MAPPER = {
                              RBACAccessType.write: [UserRole.ADMIN],
                              RBACAccessType.update: [UserRole.ADMIN],
                              RBACAccessType.delete: [UserRole.ADMIN]},
+    # only admin can export the whole catalog
+    RBACResource.inventory_export: {RBACAccessType.read: [UserRole.ADMIN]},
     #  admin cannot do anything with customer cart , customer can do everything with cart
     RBACResource.cart: {RBACAccessType.read: [UserRole.CUSTOMER],
                         RBACAccessType.write: [UserRole.CUSTOMER],
                         RBACAccessType.update: [UserRole.CUSTOMER],
-                        RBACAccessType.delete: [UserRole.CUSTOMER]}
+                        RBACAccessType.delete: [UserRole.CUSTOMER]},
+    # pool and cache internals are shown to admins only
+    RBACResource.status: {RBACAccessType.read: [UserRole.ADMIN]}
 }
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# request state key of the user data of the token verified by AuthMiddleware
+STATE_ACTOR_USER_DATA = "actor_user_data"
 
 
 def rbac_access_checker(resource: RBACResource, rbac_access_type: RBACAccessType = RBACAccessType.read):
@@ -62,11 +73,59 @@ def rbac_access_checker(resource: RBACResource, rbac_access_type: RBACAccessType
                                                             f" with operation {rbac_access_type}")
             return await func(*args, **kwargs)
 
+        # read by compile_rbac_route_table , the check runs ahead of the endpoint in AuthMiddleware as well
+        wrapper.rbac_resource = resource
+        wrapper.rbac_access_type = rbac_access_type
         return wrapper
 
     return decorator
 
 
-async def authenticate_token(token: str = Depends(oauth2_scheme)):
+async def authenticate_token(request: Request, token: str = Depends(oauth2_scheme)):
+    # the token verified by AuthMiddleware is not decoded again , its user data is set in context
+    user_token_data = getattr(request.state, STATE_ACTOR_USER_DATA, None)
+    if user_token_data is not None:
+        context_actor_user_data.set(user_token_data)
+        return
     # Decode the token and set the user data in context
     JWTHandler.decode_access_token(token=token)
+
+
+class RBACRoute(NamedTuple):
+    """auth and rbac decision of one route , precompiled for AuthMiddleware"""
+    path_regex: Pattern
+    methods: Optional[FrozenSet[str]]
+    authenticated: bool
+    resource: Optional[RBACResource]
+    rbac_access_type: Optional[RBACAccessType]
+    roles: FrozenSet[UserRole]
+
+
+def compile_rbac_route_table(routes: List[BaseRoute]) -> List[RBACRoute]:
+    """
+    one entry per route in routing order , routes are authenticated when they depend on authenticate_token and
+    have an rbac decision when their endpoint is wrapped by rbac_access_checker
+    """
+    route_table = []
+    for route in routes:
+        if not hasattr(route, "path_regex"):
+            continue
+        authenticated, resource, rbac_access_type = False, None, None
+        if isinstance(route, APIRoute):
+            authenticated = any(dependency.dependency is authenticate_token for dependency in route.dependencies)
+            resource = getattr(route.endpoint, "rbac_resource", None)
+            rbac_access_type = getattr(route.endpoint, "rbac_access_type", None)
+        methods = getattr(route, "methods", None)
+        route_table.append(RBACRoute(
+            path_regex=route.path_regex, methods=frozenset(methods) if methods else None,
+            authenticated=authenticated, resource=resource, rbac_access_type=rbac_access_type,
+            roles=frozenset(RBAC_MAPPER.get(resource, {}).get(rbac_access_type, [])) if resource else frozenset()))
+    return route_table
+
+
+def match_rbac_route(route_table: List[RBACRoute], method: str, path: str) -> Optional[RBACRoute]:
+    """the route the router would pick for the request , None if it would answer with a 404 or 405"""
+    for route in route_table:
+        if (route.methods is None or method in route.methods) and route.path_regex.match(path):
+            return route
+    return None
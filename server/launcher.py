@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+production entry point , serves the app from gunicorn with uvicorn workers tuned by config.settings.Server.
+pending migrations are applied once before the workers are forked
+
+    python -m server.launcher
+"""
+import asyncio
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from config.settings import Server, DB
+from data_adapter import migration
+from logger import logger
+
+
+# gunicorn takes the worker class by import path
+WORKER_CLASS = "server.launcher.CartServiceWorker"
+
+
+class CartServiceWorker(UvicornWorker):
+    """uvicorn worker running the event loop and http parser of the settings , UvicornWorker requires uvloop"""
+    CONFIG_KWARGS = {"loop": Server.loop, "http": Server.http}
+
+    def run(self):
+        # newer uvloop no longer creates the loop that UvicornWorker.run asks for
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        super().run()
+
+
+def get_connections_per_worker() -> int:
+    """connections to the primary db one worker may open , its pool at full overflow and its LISTEN connection"""
+    return DB.pool_size + DB.pool_max_overflow + 1
+
+
+def get_worker_count(workers: int = Server.workers) -> int:
+    """
+    the configured worker count , or one worker per cpu this process may run on capped by the workers whose db
+    connections fit in the connection budget
+    """
+    max_workers = max(1, Server.db_connection_budget // get_connections_per_worker())
+    if workers > 0:
+        if workers > max_workers:
+            logger.warning(f"SERVER_INIT::{workers} workers may open {workers * get_connections_per_worker()} db "
+                           f"connections , more than the budget of {Server.db_connection_budget}")
+        return workers
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        #  not available on macos
+        cpus = os.cpu_count() or 1
+    if cpus > max_workers:
+        logger.warning(f"SERVER_INIT::running {max_workers} workers instead of one per each of the {cpus} cpus , "
+                       f"more would not fit in the db connection budget of {Server.db_connection_budget}")
+    return min(cpus, max_workers)
+
+
+def build_options() -> dict:
+    """gunicorn settings from the server settings"""
+    return {
+        "bind": f"{Server.host}:{Server.port}",
+        "workers": get_worker_count(),
+        "worker_class": WORKER_CLASS,
+        "keepalive": Server.keepalive_seconds,
+        "backlog": Server.backlog,
+        "max_requests": Server.max_requests,
+        "max_requests_jitter": Server.max_requests_jitter,
+        "graceful_timeout": Server.graceful_timeout_seconds,
+        "timeout": Server.timeout_seconds,
+        "preload_app": Server.preload,
+        "loglevel": Server.log_level,
+    }
+
+
+class CartServiceApplication(BaseApplication):
+    """gunicorn application configured from code instead of a config file or command line"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from server.app import app
+        return app
+
+
+def main():
+    if DB.run_migrations_on_startup:
+        # in the master , outside of the worker timeout , and the only place besides the cli that builds indexes
+        asyncio.run(migration.main())
+    options = build_options()
+    logger.info(f"SERVER_INIT::starting gunicorn with {options}")
+    CartServiceApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import http
+
+from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.datastructures import Headers
+
+from config.settings import DB
+from controller.context_manager import context_db_query_stats, context_log_meta, context_actor_user_data
+from data_adapter.query_stats import DBQueryStats
+from logger import logger
+from models.base import GenericResponseModel
+from server.auth import compile_rbac_route_table, match_rbac_route, RBACRoute, STATE_ACTOR_USER_DATA
+from utils.exceptions import AuthException
+from utils.helper import build_api_response
+from utils.jwt_token_handler import JWTHandler
+
+HEADER_DB_QUERY_COUNT = b"x-db-query-count"
+HEADER_DB_TIME_MS = b"x-db-time-ms"
+
+
+class DBQueryStatsMiddleware:
+    """
+    counts the db statements and db time of every http request , reports them as response headers and logs them
+    once the request is done. statements run after the response has started , like the commit of the request
+    session or the batches of a streamed response , are only in the log
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = DBQueryStats()
+        token = context_db_query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (HEADER_DB_QUERY_COUNT, str(stats.queries).encode()),
+                    (HEADER_DB_TIME_MS, f"{stats.db_time_ms:.2f}".encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            context_db_query_stats.reset(token)
+            msg = f"REQUEST_COMPLETED {scope['method']} {scope['path']} db_queries:{stats.queries} " \
+                  f"db_time_ms:{stats.db_time_ms:.2f}"
+            if 0 < DB.query_budget_per_request < stats.queries:
+                logger.warning(extra=context_log_meta.get(),
+                               msg=f"{msg} exceeded query budget of {DB.query_budget_per_request}")
+            else:
+                logger.info(extra=context_log_meta.get(), msg=msg)
+
+
+class AuthMiddleware:
+    """
+    authenticates the token of a request and checks its rbac decision before anything else of the request is read ,
+    requests without a valid token or with a role not allowed are rejected without a db session , dependency
+    resolution or body parsing. the route table is compiled from the routes of the app on the first request.
+    the user data of the token is kept in the request state , authenticate_token takes it from there instead of
+    decoding the token again
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.route_table = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.route_table is None:
+            self.route_table = compile_rbac_route_table(scope["app"].routes)
+        route = match_rbac_route(self.route_table, scope["method"], scope["path"])
+        if route is not None and route.authenticated:
+            response = await self.authorize(route, scope)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def authorize(route: RBACRoute, scope):
+        """:return: the response rejecting the request , None if it is let through"""
+        scheme, token = get_authorization_scheme_param(Headers(scope=scope).get("authorization"))
+        if not token or scheme.lower() != "bearer":
+            # as OAuth2PasswordBearer answers
+            return JSONResponse(status_code=http.HTTPStatus.UNAUTHORIZED, content={"detail": "Not authenticated"},
+                                headers={"WWW-Authenticate": "Bearer"})
+        try:
+            user_token_data = JWTHandler.decode_access_token(token=token)
+        except AuthException as e:
+            return await build_api_response(GenericResponseModel(status_code=e.status_code, error=e.message))
+        if route.resource is not None and context_actor_user_data.get().role not in route.roles:
+            logger.error(extra=context_log_meta.get(),
+                         msg=f"rbac denied {route.rbac_access_type} on {route.resource} "
+                             f"for role {context_actor_user_data.get().role}")
+            return await build_api_response(GenericResponseModel(
+                status_code=http.HTTPStatus.FORBIDDEN,
+                error=f"You are not allowed to access resource {route.resource} with operation "
+                      f"{route.rbac_access_type}"))
+        scope.setdefault("state", {})[STATE_ACTOR_USER_DATA] = user_token_data
+        return None
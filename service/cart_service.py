@@ -1,4 +1,5 @@
 import http
+from typing import Optional
 from uuid import UUID
 
 from controller.context_manager import context_log_meta, context_actor_user_data
@@ -7,8 +8,8 @@ from data_adapter.inventory import Item
 from data_adapter.user import User
 from logger import logger
 from models.base import GenericResponseModel
-from models.cart import CartModel, CartItemQuantity, CartItemModel
-from models.inventory import ItemModel
+from models.cart import CartModel, CartItemQuantity, CartItemModel, CartResponseModel
+from models.inventory import ItemModel, ItemMetadataModel
 from models.user import UserModel
 
 
@@ -24,17 +25,28 @@ class CartService:
     ERROR_CART_ITEM_QUANTITY_NOT_ENOUGH = "Cart item quantity not enough"
 
     @staticmethod
-    def get_cart_for_customer() -> GenericResponseModel:
-        cart: CartModel = CustomerCart.get_by_customer_uuid(context_actor_user_data.get().uuid)
+    async def get_cart_etag() -> Optional[str]:
+        """
+        ETag of the cart of the customer , read before the cart itself so that the cart served is never older than
+        its ETag
+        :return: weak ETag , None if the customer has no cart
+        """
+        version = await CustomerCart.get_cart_version(context_actor_user_data.get().uuid)
+        return f'W/"cart-{version}"' if version else None
+
+    @staticmethod
+    async def get_cart_for_customer() -> GenericResponseModel:
+        cart: CartResponseModel = await CustomerCart.get_cart_response_by_customer_uuid(
+            context_actor_user_data.get().uuid)
         if not cart:
             logger.error(extra=context_log_meta.get(),
                          msg=f"No cart found for customer {context_actor_user_data.get().uuid}")
             return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
                                         error=CartService.ERROR_NO_CART_FOR_CUSTOMER)
-        return GenericResponseModel(status_code=http.HTTPStatus.OK, data=cart.build_response_model())
+        return GenericResponseModel(status_code=http.HTTPStatus.OK, data=cart)
 
     @staticmethod
-    def add_item_to_cart(item_uuid: UUID, add_item_request: CartItemQuantity) -> GenericResponseModel:
+    async def add_item_to_cart(item_uuid: UUID, add_item_request: CartItemQuantity) -> GenericResponseModel:
         """
         Add item to cart
         :param item_uuid:
@@ -42,66 +54,73 @@ class CartService:
         :return:
 
         logic for add cart item -
-        1. validations like item exists , item quantity is enough , item is not out of stock
-        2. reduce item quantity in inventory
+        1. find the customer cart , it is created only once the item is reserved
+        2. find the item metadata , served from the item metadata cache , and reserve item quantity in inventory with
+        a single conditional update , which validates that the item has enough stock and reduces its quantity in the
+        same statement
         3. add item to cart , if cart not found for customer , create it
         4. if item already exists in cart , update quantity instead of adding same item to cart
-        5. if item quantity is 0 , remove item from cart
 
         edge cases -
-        1. if item is out of stock , then item should not be added to cart this is handled
-        2. if 2 requests from different users are made to add same item to cart , and item quantity is not enough in
-        that case one of the request would try to update item quantity as negative where database check would fail
-        and only one of the request would be successful
+        1. if item is out of stock or has not enough quantity , then item should not be added to cart
+        2. if 2 requests from different users are made to add same item to cart , and item quantity is not enough for
+        both , the second update waits for the row lock of the first one and then finds the stock left too low , so
+        only one of the request is successful and the other one gets a conflict
         """
-        item_to_add: ItemModel = Item.get_by_uuid(item_uuid)
-        if not item_to_add:
+        customer_cart: CartModel = await CustomerCart.get_by_customer_uuid(context_actor_user_data.get().uuid)
+        customer: UserModel = None
+        if not customer_cart:
+            customer = await User.get_by_uuid(context_actor_user_data.get().uuid)
+            if not customer:
+                logger.error(extra=context_log_meta.get(),
+                             msg=f"Customer not found , wrong uuid {context_actor_user_data.get().uuid}")
+                return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
+                                            error=CartService.ERROR_CUSTOMER_NOT_FOUND)
+        item_metadata: ItemMetadataModel = await Item.get_item_metadata(item_uuid)
+        if not item_metadata:
             logger.error(extra=context_log_meta.get(), msg=f"Item not found {item_uuid}")
-            return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND, error=CartService.ERROR_ITEM_NOT_FOUND)
-        if item_to_add.quantity <= 0:
-            logger.error(extra=context_log_meta.get(), msg=f"Item is out of stock {item_uuid}")
-            return GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
-                                        error=CartService.ERROR_ITEM_OUT_OF_STOCK)
-        if item_to_add.quantity < add_item_request.quantity:
+            return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
+                                        error=CartService.ERROR_ITEM_NOT_FOUND)
+        item_to_add: ItemModel = await Item.reserve_item_quantity(item_metadata, add_item_request.quantity)
+        if not item_to_add:
+            # nothing was reserved , read the live stock only to tell the client why
+            quantity = await Item.get_item_quantity(item_metadata.id)
+            if not quantity:
+                logger.error(extra=context_log_meta.get(), msg=f"Item is out of stock {item_uuid}")
+                return GenericResponseModel(status_code=http.HTTPStatus.CONFLICT,
+                                            error=CartService.ERROR_ITEM_OUT_OF_STOCK)
             logger.error(extra=context_log_meta.get(), msg=f"Item quantity not enough {item_uuid}")
-            return GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
+            return GenericResponseModel(status_code=http.HTTPStatus.CONFLICT,
                                         error=CartService.ERROR_ITEM_QUANTITY_NOT_ENOUGH)
-        customer_cart: CartModel = CustomerCart.get_by_customer_uuid(context_actor_user_data.get().uuid)
         if not customer_cart:
             #  create cart if not yet created
             logger.info(extra=context_log_meta.get(),
                         msg=f"No cart found for customer {context_actor_user_data.get()} , so creating it")
-            customer: UserModel = User.get_by_uuid(context_actor_user_data.get().uuid)
-            if not customer:
-                logger.error(extra=context_log_meta.get(),
-                             msg=f"Customer not found , wrong uuid {context_actor_user_data.get().uuid}")
-                return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
-                                            error=CartService.ERROR_CUSTOMER_NOT_FOUND)
-            customer_cart = CustomerCart.create_cart_for_customer(customer.id)
-        # reduce item quantity in inventory after validations
-        Item.decrease_item_quantity(str(item_uuid), add_item_request.quantity)
-        # update item quantity
-        item_to_add.quantity -= add_item_request.quantity
+            customer_cart = await CustomerCart.create_cart_for_customer(customer.id)
         #  check if item is already in cart if exists , update quantity instead of adding same item to cart
         for cart_item in customer_cart.cart_items:
             if cart_item.item_id == item_to_add.id:
                 # update quantity
-                CartItem.update_item_quantity_in_cart(cart_item_id=cart_item.id,
-                                                      quantity=cart_item.quantity_in_cart + add_item_request.quantity)
+                await CartItem.update_item_quantity_in_cart(
+                    cart_item_id=cart_item.id, quantity=cart_item.quantity_in_cart + add_item_request.quantity)
                 # update response data
                 cart_item.quantity_in_cart += add_item_request.quantity
                 cart_item.original_item = item_to_add
+                customer_cart.refresh_total_price()
                 return GenericResponseModel(status_code=http.HTTPStatus.OK, data=customer_cart.build_response_model())
         # add item to cart if already not exists
-        cart_item_added: CartItemModel = CartItem.add_item_to_cart(cart_id=customer_cart.id, item_id=item_to_add.id,
-                                                                   quantity=add_item_request.quantity)
+        cart_item_added: CartItemModel = await CartItem.add_item_to_cart(cart_id=customer_cart.id,
+                                                                         item_id=item_to_add.id,
+                                                                         quantity=add_item_request.quantity)
         #  update response data
         customer_cart.cart_items.append(cart_item_added)
+        customer_cart.refresh_total_price()
         logger.info(extra=context_log_meta.get(), msg=f"Item added to cart {cart_item_added}")
         return GenericResponseModel(status_code=http.HTTPStatus.CREATED, data=customer_cart.build_response_model())
 
     @staticmethod
-    def remove_item_from_cart(cart_item_uuid: UUID, remove_item_request: CartItemQuantity) -> GenericResponseModel:
+    async def remove_item_from_cart(cart_item_uuid: UUID,
+                                    remove_item_request: CartItemQuantity) -> GenericResponseModel:
         """
         Remove item from cart
         :param cart_item_uuid:
@@ -113,12 +132,12 @@ class CartService:
         2. if cart item quantity is 0 , remove item from cart
         3. if cart item quantity is not 0 , update item quantity in cart
         """
-        cart_item_to_update: CartItemModel = CartItem.get_by_uuid(cart_item_uuid)
+        cart_item_to_update: CartItemModel = await CartItem.get_by_uuid(cart_item_uuid)
         if not cart_item_to_update:
             logger.error(extra=context_log_meta.get(), msg=f"Cart item to remove not found for uuid {cart_item_uuid}")
             return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
                                         error=CartService.ERROR_CART_ITEM_NOT_FOUND)
-        customer_cart: CartModel = CustomerCart.get_by_customer_uuid(context_actor_user_data.get().uuid)
+        customer_cart: CartModel = await CustomerCart.get_by_customer_uuid(context_actor_user_data.get().uuid)
         if not customer_cart or customer_cart.id != cart_item_to_update.cart_id:
             logger.error(extra=context_log_meta.get(),
                          msg=f"Customer cart not found for customer uuid {context_actor_user_data.get().uuid}")
@@ -130,17 +149,18 @@ class CartService:
             return GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
                                         error=CartService.ERROR_CART_ITEM_QUANTITY_NOT_ENOUGH)
         #  update item quantity in inventory
-        Item.increase_item_quantity(str(cart_item_to_update.original_item.uuid), remove_item_request.quantity)
+        await Item.increase_item_quantity(str(cart_item_to_update.original_item.uuid), remove_item_request.quantity)
         if cart_item_to_update.quantity_in_cart - remove_item_request.quantity == 0:
             # remove item from cart
-            CartItem.delete_item_from_cart(cart_item_id=cart_item_to_update.id)
+            await CartItem.delete_item_from_cart(cart_item_id=cart_item_to_update.id)
             # update response data
             customer_cart.cart_items = [cart_item for cart_item in customer_cart.cart_items if
                                         cart_item.id != cart_item_to_update.id]
+            customer_cart.refresh_total_price()
             return GenericResponseModel(status_code=http.HTTPStatus.OK,
                                         data=customer_cart.build_response_model())
         # else update item quantity in cart
-        CartItem.update_item_quantity_in_cart(
+        await CartItem.update_item_quantity_in_cart(
             cart_item_id=cart_item_to_update.id,
             quantity=cart_item_to_update.quantity_in_cart - remove_item_request.quantity)
         # update response data
@@ -149,4 +169,5 @@ class CartService:
                 cart_item.quantity_in_cart -= remove_item_request.quantity
                 cart_item.original_item.quantity += remove_item_request.quantity
                 break
+        customer_cart.refresh_total_price()
         return GenericResponseModel(status_code=http.HTTPStatus.OK, data=customer_cart.build_response_model())
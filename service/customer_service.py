@@ -13,17 +13,19 @@ class CustomerService:
     MSG_CUSTOMER_SUSPENDED = "Customer is suspended successfully"
 
     @staticmethod
-    def suspend_customer(customer_uuid: str) -> GenericResponseModel:
+    async def suspend_customer(customer_uuid: str) -> GenericResponseModel:
         """
         Suspend customer
         :param customer_uuid: customer uuid to suspend
         :return: GenericResponseModel
         """
         # only customer role user can be suspended
-        updates = User.update_user_by_uuid(user_uuid=customer_uuid, user_role=UserRole.CUSTOMER,
-                                           update_dict={User.status: UserStatus.SUSPENDED})
+        updates = await User.update_user_by_uuid(user_uuid=customer_uuid, user_role=UserRole.CUSTOMER,
+                                                 update_dict={User.status: UserStatus.SUSPENDED})
         if not updates:
             logger.error(extra=context_log_meta.get(), msg=f"User with uuid {customer_uuid} not found")
             return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
                                         error=CustomerService.ERROR_CUSTOMER_NOT_FOUND)
+        #  tokens the customer already holds stop working in stateless auth mode as well
+        await User.revoke_tokens(customer_uuid)
         return GenericResponseModel(status_code=http.HTTPStatus.OK, message=CustomerService.MSG_CUSTOMER_SUSPENDED)
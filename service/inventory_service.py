@@ -1,43 +1,221 @@
+import csv
 import http
-from typing import List
+import io
+import json
+from datetime import datetime
+from typing import List, AsyncIterator, Dict, Tuple, Optional
 
+from pydantic import ValidationError
+
+from config.settings import Inventory
 from controller.context_manager import context_log_meta
-from data_adapter.inventory import Item
+from data_adapter.inventory import Item, InventoryVersion
 from logger import logger
-from models.base import GenericResponseModel
-from models.inventory import ItemModel, ItemInsertModel
+from models.base import GenericResponseModel, KeysetCursor
+from models.inventory import ItemModel, ItemInsertModel, ItemFilterModel, ItemPageResponseModel, ExportFormat, \
+    ImportConflictAction, ItemImportReportModel, ItemImportRowErrorModel
 
 
 class InventoryService:
     ERROR_NO_ITEMS_IN_INVENTORY = "No items found in inventory"
     ERROR_ITEM_ALREADY_IN_INVENTORY = "Item already exists in inventory , try updating existing item"
+    ERROR_INVALID_CURSOR = "Invalid pagination cursor"
+    ERROR_EMPTY_IMPORT = "No rows found in the uploaded file"
+    ERROR_DUPLICATE_IMPORT_ROW = "Duplicate of row {row} with the same name and category"
+
+    EXPORT_COLUMNS = ["uuid", "category", "name", "description", "price", "image", "quantity", "created_at",
+                      "updated_at"]
+    EXPORT_MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
 
     @staticmethod
-    def get_all_items_in_inventory() -> GenericResponseModel:
+    async def get_inventory_etag() -> str:
         """
-        Get all items from inventory
+        ETag of the inventory listing , one for every page and filter as they all change with the catalog and its
+        stock. read before the items so that the items served are never older than their ETag
+        :return: weak ETag
+        """
+        return InventoryService.build_inventory_etag(await InventoryVersion.get_versions())
+
+    @staticmethod
+    def build_inventory_etag(versions: Tuple[int, int]) -> str:
+        version, stock_stamp = versions
+        return f'W/"inventory-{version}-{stock_stamp}"'
+
+    @staticmethod
+    async def get_items_in_inventory(limit: int, after: str = None,
+                                     filters: ItemFilterModel = None) -> GenericResponseModel:
+        """
+        Get one page of items from inventory
+        :param limit: page size
+        :param after: cursor returned as next_cursor of the previous page
+        :param filters: ItemFilterModel
         :return: GenericResponseModel
         """
-        items: List[ItemModel] = Item.get_all_items()
+        try:
+            cursor = KeysetCursor.decode(after) if after else None
+        except ValueError:
+            logger.error(extra=context_log_meta.get(), msg=f"Invalid pagination cursor {after}")
+            return GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
+                                        error=InventoryService.ERROR_INVALID_CURSOR)
+        items, next_cursor = await Item.get_items_page(limit=limit, after=cursor, filters=filters)
         if not items:
             logger.error(extra=context_log_meta.get(), msg="No items found in inventory")
             return GenericResponseModel(status_code=http.HTTPStatus.NOT_FOUND,
                                         error=InventoryService.ERROR_NO_ITEMS_IN_INVENTORY, data=[])
-        return GenericResponseModel(status_code=http.HTTPStatus.OK,
-                                    data=[item.build_response_model() for item in items])
+        return GenericResponseModel(status_code=http.HTTPStatus.OK, data=ItemPageResponseModel.construct(
+            items=items, next_cursor=next_cursor.encode() if next_cursor else None))
 
     @staticmethod
-    def add_item_to_inventory(item: ItemInsertModel) -> GenericResponseModel:
+    async def add_item_to_inventory(item: ItemInsertModel) -> GenericResponseModel:
         """
         Add item to inventory
         :param item: ItemInsertModel
         :return: GenericResponseModel
         """
-        existing_item: ItemModel = Item.get_by_name_and_category(item.name, item.category)
+        existing_item: ItemModel = await Item.get_by_name_and_category(item.name, item.category)
         if existing_item:
             logger.error(extra=context_log_meta.get(), msg="Item already exists in inventory"
                                                            f"{existing_item}")
             return GenericResponseModel(status_code=http.HTTPStatus.CONFLICT,
                                         error=InventoryService.ERROR_ITEM_ALREADY_IN_INVENTORY)
-        item = Item.create_item(item.build_db_model())
+        item = await Item.create_item(item.build_db_model())
         return GenericResponseModel(status_code=http.HTTPStatus.CREATED, data=item.build_response_model())
+
+    @staticmethod
+    async def export_items(export_format: ExportFormat) -> AsyncIterator[str]:
+        """
+        Export the whole inventory , one chunk per batch read from db so memory use does not grow with catalog size
+        :param export_format: ExportFormat
+        :return: async iterator of serialised chunks
+        """
+        if export_format == ExportFormat.CSV:
+            yield InventoryService._to_csv([InventoryService.EXPORT_COLUMNS])
+        exported = 0
+        async for items in Item.stream_items(batch_size=Inventory.export_batch_size):
+            exported += len(items)
+            if export_format == ExportFormat.CSV:
+                yield InventoryService._to_csv(
+                    [[item[column] for column in InventoryService.EXPORT_COLUMNS] for item in items])
+            else:
+                yield "".join(json.dumps(item, default=InventoryService._json_default) + "\n" for item in items)
+        logger.info(extra=context_log_meta.get(), msg=f"Exported {exported} items as {export_format.value}")
+
+    @staticmethod
+    async def import_items(lines: AsyncIterator[str], import_format: ExportFormat,
+                           on_conflict: ImportConflictAction) -> GenericResponseModel:
+        """
+        Bulk import items , rows are validated as they are read and written in batches of upserts.
+        every batch is committed on its own , rows are not kept locked until the whole upload has been read.
+        invalid rows do not stop the import , they are reported back with their row number
+        :param lines: lines of the uploaded file
+        :param import_format: ndjson or csv , csv needs a header row naming the columns
+        :param on_conflict: skip or update rows matching a live item on (name, category)
+        :return: GenericResponseModel with ItemImportReportModel
+        """
+        report = ItemImportReportModel()
+        # first row of every (name, category) in the upload , later rows are rejected as duplicates
+        seen_rows: Dict[Tuple[str, str], int] = {}
+        batch: List[dict] = []
+        batch_size = min(Inventory.import_batch_size, Item.get_max_bulk_upsert_rows())
+        async for row, record, parse_error in InventoryService._iter_import_records(lines, import_format):
+            report.received += 1
+            if parse_error:
+                InventoryService._add_import_error(report, row, [parse_error])
+                continue
+            try:
+                item = ItemInsertModel.parse_obj(record)
+            except ValidationError as e:
+                InventoryService._add_import_error(
+                    report, row, [f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                                  for error in e.errors()])
+                continue
+            key = (item.name, item.category.value)
+            if key in seen_rows:
+                InventoryService._add_import_error(
+                    report, row, [InventoryService.ERROR_DUPLICATE_IMPORT_ROW.format(row=seen_rows[key])])
+                continue
+            seen_rows[key] = row
+            batch.append(item.dict())
+            if len(batch) >= batch_size:
+                await InventoryService._write_import_batch(batch, on_conflict, report)
+                batch = []
+        if batch:
+            await InventoryService._write_import_batch(batch, on_conflict, report)
+        if not report.received:
+            return GenericResponseModel(status_code=http.HTTPStatus.BAD_REQUEST,
+                                        error=InventoryService.ERROR_EMPTY_IMPORT)
+        logger.info(extra=context_log_meta.get(),
+                    msg=f"Imported items received:{report.received} created:{report.created} "
+                        f"updated:{report.updated} skipped:{report.skipped} failed:{report.failed}")
+        return GenericResponseModel(status_code=http.HTTPStatus.OK, data=report)
+
+    @staticmethod
+    async def _iter_import_records(lines: AsyncIterator[str], import_format: ExportFormat) \
+            -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+        """yields (row number, record, parse error) for every non blank row of the upload"""
+        row = 0
+        if import_format == ExportFormat.NDJSON:
+            async for line in lines:
+                if not line.strip():
+                    continue
+                row += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield row, None, f"invalid json: {e}"
+                    continue
+                if isinstance(record, dict):
+                    yield row, record, None
+                else:
+                    yield row, None, "invalid json: expected an object"
+            return
+        header = None
+        pending = []
+        async for line in lines:
+            pending.append(line)
+            # a quoted csv value can span lines , the record ends once its quotes are balanced
+            if sum(part.count('"') for part in pending) % 2:
+                continue
+            text = "\n".join(pending)
+            pending = []
+            if not text.strip():
+                continue
+            values = next(csv.reader([text]))
+            if header is None:
+                header = [column.strip() for column in values]
+                continue
+            row += 1
+            if len(values) != len(header):
+                yield row, None, f"expected {len(header)} columns , found {len(values)}"
+                continue
+            # empty csv values are treated as missing so the model defaults apply
+            yield row, {column: value for column, value in zip(header, values) if value != ""}, None
+        if pending:
+            yield row + 1, None, "unterminated quoted value"
+
+    @staticmethod
+    async def _write_import_batch(batch: List[dict], on_conflict: ImportConflictAction,
+                                  report: ItemImportReportModel):
+        written = await Item.bulk_upsert_items(batch, update_existing=on_conflict == ImportConflictAction.UPDATE)
+        created = sum(1 for _, _, is_created in written if is_created)
+        report.created += created
+        report.updated += len(written) - created
+        report.skipped += len(batch) - len(written)
+
+    @staticmethod
+    def _add_import_error(report: ItemImportReportModel, row: int, errors: List[str]):
+        report.failed += 1
+        if len(report.errors) < Inventory.import_max_errors:
+            report.errors.append(ItemImportRowErrorModel(row=row, errors=errors))
+
+    @staticmethod
+    def _to_csv(rows: List[list]) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([[value.isoformat() if isinstance(value, datetime) else value for value in row]
+                          for row in rows])
+        return buffer.getvalue()
+
+    @staticmethod
+    def _json_default(value):
+        return value.isoformat() if isinstance(value, datetime) else str(value)
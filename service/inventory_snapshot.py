@@ -0,0 +1,120 @@
+import http
+import time
+import uuid
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi.responses import Response
+
+from config.settings import Inventory
+from controller.context_manager import context_api_id, context_log_meta, release_db_session
+from data_adapter.inventory import InventoryVersion
+from data_adapter.notifications import notification_listener, INVENTORY_CHANGED_CHANNEL
+from logger import logger
+from models.inventory import ItemFilterModel
+from service.inventory_service import InventoryService
+from utils.cache import LRUTTLCache
+from utils.helper import build_api_response, build_not_modified_response, etag_matches, render_json, accepts_gzip, \
+    deflate_raw, gzip_with_deflated_tail
+
+# every rendered response starts with the api_id of its request , the rest of a snapshot page is shared
+API_ID_PREFIX = b'{"api_id":"'
+
+
+class SnapshotPage(NamedTuple):
+    """one rendered listing page , split after its api_id value"""
+    versions: Tuple[int, int]
+    body_tail: bytes
+    deflated_tail: Optional[bytes]
+
+
+class InventorySnapshot:
+    """
+    per worker snapshot of the inventory listing. pages are kept rendered , and deflated , and served without reading
+    items or encoding anything. a page is tagged with the inventory version and stock stamp it was read at and is
+    served only while both are current. both are re-read when the worker hears of a catalog change , from its own
+    writes or the notifications of the other workers , and every snapshot_refresh_seconds as stock changes are not
+    notified
+    """
+
+    def __init__(self):
+        self.versions: Optional[Tuple[int, int]] = None
+        self.versions_seen_at = 0.0
+        self.pages = LRUTTLCache(max_size=Inventory.snapshot_max_pages, ttl_seconds=Inventory.snapshot_max_age_seconds)
+
+    def observe_versions(self, versions: Tuple[int, int]):
+        if self.versions is None or versions > self.versions:
+            self.versions = versions
+            self.pages.clear()
+        self.versions_seen_at = time.monotonic()
+
+    def observe_version(self, version: int):
+        """a catalog change was notified , its stock stamp is not known and both are read again on the next request"""
+        if self.versions is None or version > self.versions[0]:
+            self.forget_versions()
+
+    def forget_versions(self):
+        """notifications may have been missed , the versions are read again on the next request"""
+        self.versions = None
+        self.pages.clear()
+
+    async def get_current_versions(self) -> Tuple[Tuple[int, int], Optional[Tuple[int, int]]]:
+        """:return: current versions , and the versions read from db if they had to be read"""
+        if self.versions is None or time.monotonic() - self.versions_seen_at >= Inventory.snapshot_refresh_seconds:
+            read_versions = await InventoryVersion.get_versions()
+            self.observe_versions(read_versions)
+            return self.versions, read_versions
+        return self.versions, None
+
+    async def get_items_response(self, limit: int, after: Optional[str], filters: ItemFilterModel,
+                                 if_none_match: Optional[str], accept_encoding: Optional[str]) -> Response:
+        """
+        the listing page from the snapshot , read and rendered only if the snapshot has no current copy of it
+        :return: rendered response , or 304 if If-None-Match matches the current versions
+        """
+        versions, read_versions = await self.get_current_versions()
+        etag = InventoryService.build_inventory_etag(versions)
+        if etag_matches(if_none_match, etag):
+            return await build_not_modified_response(etag)
+        query = (limit, after, filters.category, filters.min_price, filters.max_price, filters.in_stock)
+        page: SnapshotPage = self.pages.get(versions + query)
+        if page is None:
+            # read before the items , the page holds at least the changes counted in them
+            page_versions = read_versions if read_versions is not None else await InventoryVersion.get_versions()
+            response = await InventoryService.get_items_in_inventory(limit=limit, after=after, filters=filters)
+            if response.status_code != http.HTTPStatus.OK:
+                return await build_api_response(response)
+            page = self.build_page(page_versions, response)
+            self.observe_versions(page_versions)
+            # a page read from a replica behind the versions heard of is served but not kept
+            if page_versions == self.versions:
+                self.pages.set(page_versions + query, page)
+        await release_db_session()
+        return self.build_response(page, accept_encoding)
+
+    @staticmethod
+    def build_page(versions: Tuple[int, int], response) -> SnapshotPage:
+        response.api_id = ""
+        body = render_json(response)
+        body_tail = body[len(API_ID_PREFIX):]
+        return SnapshotPage(versions=versions, body_tail=body_tail,
+                            deflated_tail=deflate_raw(body_tail) if Inventory.snapshot_gzip else None)
+
+    @staticmethod
+    def build_response(page: SnapshotPage, accept_encoding: Optional[str]) -> Response:
+        head = API_ID_PREFIX + (context_api_id.get() or str(uuid.uuid4())).encode()
+        headers = {"ETag": InventoryService.build_inventory_etag(page.versions),
+                   "Vary": "Accept-Encoding"}
+        if page.deflated_tail is not None and accepts_gzip(accept_encoding):
+            body = gzip_with_deflated_tail(head, page.body_tail, page.deflated_tail)
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = head + page.body_tail
+        logger.info(extra=context_log_meta.get(),
+                    msg=f"InventorySnapshot: served snapshot page of inventory versions {page.versions}")
+        return Response(content=body, status_code=http.HTTPStatus.OK, media_type="application/json", headers=headers)
+
+
+inventory_snapshot = InventorySnapshot()
+notification_listener.add_handler(INVENTORY_CHANGED_CHANNEL,
+                                  lambda version: inventory_snapshot.observe_version(int(version)),
+                                  resync_handler=inventory_snapshot.forget_versions)
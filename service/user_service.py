@@ -4,54 +4,99 @@ from controller.context_manager import context_log_meta
 from data_adapter.user import User
 from logger import logger
 from models.base import GenericResponseModel
-from models.user import UserInsertModel, UserLoginModel, UserModel, UserTokenResponseModel
+from models.user import UserInsertModel, UserLoginModel, UserModel, UserTokenResponseModel, RefreshTokenModel, \
+    UserStatus
+from utils.exceptions import ServiceOverloadedException
 from utils.jwt_token_handler import JWTHandler
-from utils.password_hasher import PasswordHasher
+from utils.password_hasher import PasswordHasher, password_hashing_pool
 
 
 class UserService:
     MSG_USER_CREATED_SUCCESS = "User created successfully"
     MSG_USER_LOGIN_SUCCESS = "Login successful"
     MSG_USER_SUSPENDED = "User is suspended successfully"
+    MSG_TOKEN_REFRESH_SUCCESS = "Token refreshed successfully"
 
     ERROR_INVALID_CREDENTIALS = "Invalid credentials"
     ERROR_USER_NOT_FOUND = "User not found"
+    ERROR_USER_NOT_ACTIVE = "User is not active"
 
     @staticmethod
-    def signup_user(user: UserInsertModel) -> GenericResponseModel:
+    async def signup_user(user: UserInsertModel) -> GenericResponseModel:
         """
         Sign up user
         :param user: user details to add
         :return: GenericResponseModel
         """
-        hashed_password = PasswordHasher.get_password_hash(user.password)
+        hashed_password = await password_hashing_pool.run(PasswordHasher.get_password_hash, user.password)
         user_to_create = user.create_db_entity(password_hash=hashed_password)
-        user_data = User.create_user(user_to_create)
+        user_data = await User.create_user(user_to_create)
         logger.info(extra=context_log_meta.get(),
                     msg="User created successfully with uuid {}".format(user_to_create.uuid))
         return GenericResponseModel(status_code=http.HTTPStatus.CREATED, message=UserService.MSG_USER_CREATED_SUCCESS,
                                     data=user_data.build_response_model())
 
     @staticmethod
-    def login_user(user_login_request: UserLoginModel) -> GenericResponseModel:
+    async def login_user(user_login_request: UserLoginModel) -> GenericResponseModel:
         """
         Login user
         :param user_login_request: user login details
         :return: GenericResponseModel
         """
-        user: UserModel = User.get_active_user_by_email(user_login_request.email)
+        user: UserModel = await User.get_active_user_by_email(user_login_request.email)
         if not user:
             logger.error(extra=context_log_meta.get(), msg=f"user not found for email {user_login_request.email}")
             return GenericResponseModel(status_code=http.HTTPStatus.UNAUTHORIZED,
                                         error=UserService.ERROR_USER_NOT_FOUND)
-        if PasswordHasher.verify_password(user_login_request.password, user.password_hash):
+        if await password_hashing_pool.run(PasswordHasher.verify_password, user_login_request.password,
+                                           user.password_hash):
+            await UserService.rehash_password_if_needed(user, user_login_request.password)
             token = JWTHandler.create_access_token(user.build_user_token_data())
             logger.info(extra=context_log_meta.get(), msg=f"Login successful for user {user.email}"
                                                           f" with token {token}")
-            #  return token to client for further use
+            #  return token to client for further use , and a refresh token to get new ones once it expires
             return GenericResponseModel(status_code=http.HTTPStatus.OK, data=UserTokenResponseModel(
-                access_token=token, user_uuid=user.uuid, user_role=user.role, user_status=user.status),
-                                        message=UserService.MSG_USER_LOGIN_SUCCESS)
+                access_token=token, refresh_token=JWTHandler.create_refresh_token(user.uuid), user_uuid=user.uuid,
+                user_role=user.role, user_status=user.status), message=UserService.MSG_USER_LOGIN_SUCCESS)
         logger.error(extra=context_log_meta.get(), msg=f"Invalid credentials for user {user.email}")
         return GenericResponseModel(status_code=http.HTTPStatus.UNAUTHORIZED,
                                     error=UserService.ERROR_INVALID_CREDENTIALS)
+
+    @staticmethod
+    async def refresh_access_token(refresh_request: RefreshTokenModel) -> GenericResponseModel:
+        """
+        Issue a new access token for a refresh token , the user is read again so suspended users get none
+        :param refresh_request: refresh token issued at login
+        :return: GenericResponseModel
+        """
+        user_uuid = JWTHandler.decode_refresh_token(refresh_request.refresh_token)
+        user: UserModel = await User.get_by_uuid(user_uuid)
+        if not user:
+            logger.error(extra=context_log_meta.get(), msg=f"user not found for uuid {user_uuid}")
+            return GenericResponseModel(status_code=http.HTTPStatus.UNAUTHORIZED,
+                                        error=UserService.ERROR_USER_NOT_FOUND)
+        if user.status != UserStatus.ACTIVE:
+            logger.error(extra=context_log_meta.get(), msg=f"refresh denied for inactive user {user_uuid}")
+            return GenericResponseModel(status_code=http.HTTPStatus.UNAUTHORIZED,
+                                        error=UserService.ERROR_USER_NOT_ACTIVE)
+        token = JWTHandler.create_access_token(user.build_user_token_data())
+        logger.info(extra=context_log_meta.get(), msg=f"Token refreshed for user {user.email}")
+        return GenericResponseModel(status_code=http.HTTPStatus.OK, data=UserTokenResponseModel(
+            access_token=token, refresh_token=refresh_request.refresh_token, user_uuid=user.uuid,
+            user_role=user.role, user_status=user.status), message=UserService.MSG_TOKEN_REFRESH_SUCCESS)
+
+    @staticmethod
+    async def rehash_password_if_needed(user: UserModel, password: str):
+        """
+        moves the password hash of a user who just logged in to the current hashing policy , the plain password is
+        only known at login. best effort , the login goes on with the old hash if no hashing slot is free
+        """
+        if not PasswordHasher.needs_update(user.password_hash):
+            return
+        try:
+            password_hash = await password_hashing_pool.run(PasswordHasher.get_password_hash, password)
+        except ServiceOverloadedException:
+            logger.info(extra=context_log_meta.get(), msg=f"password rehash skipped for user {user.uuid} , overloaded")
+            return
+        await User.update_user_by_uuid(user_uuid=user.uuid, update_dict={User.password_hash: password_hash})
+        logger.info(extra=context_log_meta.get(), msg=f"password rehashed to current policy for user {user.uuid}")
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from controller.context_manager import context_set_db_session_rollback
+from data_adapter.db import end_db_session, run_after_commit, SESSION_INFO_READ_ONLY
+
+
+class TestEndDBSession(unittest.IsolatedAsyncioTestCase):
+
+    def build_session(self, info=None):
+        db = MagicMock()
+        db.info = info or {}
+        db.commit, db.rollback, db.close = AsyncMock(), AsyncMock(), AsyncMock()
+        return db
+
+    async def test_commits_and_closes(self):
+        db = self.build_session()
+
+        await end_db_session(db)
+
+        db.commit.assert_awaited_once()
+        db.rollback.assert_not_awaited()
+        db.close.assert_awaited_once()
+
+    async def test_rolls_back_when_flagged(self):
+        db = self.build_session()
+        token = context_set_db_session_rollback.set(True)
+        self.addCleanup(context_set_db_session_rollback.reset, token)
+
+        await end_db_session(db)
+
+        db.rollback.assert_awaited_once()
+        db.commit.assert_not_awaited()
+        db.close.assert_awaited_once()
+
+    async def test_read_only_session_is_not_committed(self):
+        db = self.build_session(info={SESSION_INFO_READ_ONLY: True})
+
+        await end_db_session(db)
+
+        db.commit.assert_not_awaited()
+        db.close.assert_awaited_once()
+
+    async def test_session_is_ended_once(self):
+        db = self.build_session()
+
+        await end_db_session(db)
+        await end_db_session(db)
+
+        db.commit.assert_awaited_once()
+        db.close.assert_awaited_once()
+
+    async def test_failed_commit_is_rolled_back(self):
+        db = self.build_session()
+        db.commit.side_effect = RuntimeError("commit failed")
+
+        with self.assertRaises(RuntimeError):
+            await end_db_session(db)
+
+        db.rollback.assert_awaited_once()
+        db.close.assert_awaited_once()
+
+    async def test_after_commit_callbacks_run_once_committed(self):
+        db = self.build_session()
+        callback = AsyncMock()
+        run_after_commit(db, callback)
+        run_after_commit(db, callback)
+
+        await end_db_session(db)
+
+        callback.assert_awaited_once()
+
+    async def test_after_commit_callbacks_are_dropped_on_rollback(self):
+        db = self.build_session()
+        callback = AsyncMock()
+        run_after_commit(db, callback)
+        token = context_set_db_session_rollback.set(True)
+        self.addCleanup(context_set_db_session_rollback.reset, token)
+
+        await end_db_session(db)
+
+        callback.assert_not_awaited()
+
+    async def test_failing_after_commit_callback_is_not_raised(self):
+        db = self.build_session()
+        run_after_commit(db, AsyncMock(side_effect=RuntimeError("callback failed"), __qualname__="callback"))
+
+        await end_db_session(db)
+
+        db.close.assert_awaited_once()
@@ -0,0 +1,21 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from sqlalchemy.dialects import postgresql
+
+from data_adapter.inventory import Item
+from models.inventory import ItemFilterModel
+
+
+class TestItemListing(unittest.IsolatedAsyncioTestCase):
+
+    async def test_in_stock_filter_matches_partial_index_predicate(self):
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+        with patch('controller.context_manager.get_db_session', return_value=db):
+            await Item.get_items_page(limit=10, filters=ItemFilterModel(in_stock=True))
+
+        compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        # the constants have to be part of the sql text , generic plans of bound values skip the partial index
+        self.assertIn("item.quantity > 0", str(compiled))
+        self.assertIn("item.is_deleted IS false", str(compiled))
@@ -0,0 +1,103 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from data_adapter.db import end_db_session
+from data_adapter.inventory import Item, item_metadata_cache
+from data_adapter.notifications import notification_listener, ITEM_CHANGED_CHANNEL, MAX_NOTIFY_PAYLOAD_BYTES
+from utils.cache import LRUTTLCache
+
+
+class TestLRUTTLCache(unittest.TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUTTLCache(max_size=2, ttl_seconds=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    @patch('utils.cache.time.monotonic')
+    def test_expired_entry_is_a_miss(self, mock_monotonic):
+        cache = LRUTTLCache(max_size=2, ttl_seconds=60)
+        mock_monotonic.return_value = 100
+        cache.set('a', 1)
+        mock_monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 1)
+        mock_monotonic.return_value = 160
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_zero_ttl_disables_cache(self):
+        cache = LRUTTLCache(max_size=2, ttl_seconds=0)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+
+class TestItemMetadataCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        item_metadata_cache.clear()
+        self.addCleanup(item_metadata_cache.clear)
+        self.item_uuid = uuid.uuid4()
+        row = SimpleNamespace(id=1, uuid=self.item_uuid, created_at="2023-04-09T14:53:10.285Z", updated_at=None,
+                              is_deleted=False, category="electronics", name="Laptop", description=None, price=1000.0,
+                              image=None)
+        self.db = MagicMock()
+        self.db.execute = AsyncMock(return_value=MagicMock(first=MagicMock(return_value=row)))
+        patcher = patch('controller.context_manager.get_db_session', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_metadata_is_read_once(self):
+        first = await Item.get_item_metadata(self.item_uuid)
+        second = await Item.get_item_metadata(str(self.item_uuid))
+
+        self.assertEqual(first.name, "Laptop")
+        self.assertIs(first, second)
+        self.db.execute.assert_awaited_once()
+
+    async def test_invalidated_metadata_is_read_again(self):
+        await Item.get_item_metadata(self.item_uuid)
+        item_metadata_cache.invalidate(str(self.item_uuid))
+        await Item.get_item_metadata(self.item_uuid)
+
+        self.assertEqual(self.db.execute.await_count, 2)
+
+    @patch('data_adapter.inventory.notify')
+    async def test_metadata_is_dropped_only_once_the_write_commits(self, mock_notify):
+        await Item.get_item_metadata(self.item_uuid)
+        db = MagicMock(info={}, commit=AsyncMock(), close=AsyncMock())
+
+        await Item.invalidate_metadata_after_commit(db, [str(self.item_uuid)])
+
+        self.assertIsNotNone(item_metadata_cache.get(str(self.item_uuid)))
+        mock_notify.assert_awaited_once_with(ITEM_CHANGED_CHANNEL, str(self.item_uuid), db=db)
+        await end_db_session(db)
+        self.assertIsNone(item_metadata_cache.get(str(self.item_uuid)))
+
+    @patch('data_adapter.inventory.notify')
+    async def test_notification_payloads_stay_under_postgres_limit(self, mock_notify):
+        item_uuids = [str(uuid.uuid4()) for _ in range(500)]
+
+        await Item.invalidate_metadata_after_commit(MagicMock(info={}), item_uuids)
+
+        payloads = [call.args[1] for call in mock_notify.await_args_list]
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload) <= MAX_NOTIFY_PAYLOAD_BYTES for payload in payloads))
+        self.assertEqual(" ".join(payloads).split(), item_uuids)
+
+    async def test_notification_drops_metadata(self):
+        await Item.get_item_metadata(self.item_uuid)
+
+        notification_listener._dispatch(None, 0, ITEM_CHANGED_CHANNEL, f"{uuid.uuid4()} {self.item_uuid}")
+
+        self.assertIsNone(item_metadata_cache.get(str(self.item_uuid)))
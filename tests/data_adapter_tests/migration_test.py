@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from data_adapter import migration
+from data_adapter.migration import split_sql_statements, load_migrations, MIGRATIONS_DIR
+from utils.exceptions import MigrationException
+
+
+class TestMigration(unittest.TestCase):
+
+    def test_split_sql_statements(self):
+        sql = """
+        -- comment with ; inside
+        CREATE INDEX a_idx ON a (b); INSERT INTO a VALUES ('x;y');
+        CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql;
+        """
+        statements = split_sql_statements(sql)
+        self.assertEqual(statements, ["CREATE INDEX a_idx ON a (b)", "INSERT INTO a VALUES ('x;y')",
+                                      "CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql"])
+
+    def test_load_migrations_in_version_order(self):
+        with tempfile.TemporaryDirectory() as migrations_dir:
+            files = {"0010_second.sql": "SELECT 2;",
+                     "0002_first.sql": "-- migrate:no-transaction\nSELECT 1;",
+                     "readme.txt": "not a migration"}
+            for file_name, sql in files.items():
+                with open(os.path.join(migrations_dir, file_name), "w") as migration_file:
+                    migration_file.write(sql)
+
+            migrations = load_migrations(migrations_dir)
+
+        self.assertEqual([migration.version for migration in migrations], [2, 10])
+        self.assertFalse(migrations[0].in_transaction)
+        self.assertTrue(migrations[1].in_transaction)
+        self.assertEqual(migrations[0].statements, ["SELECT 1"])
+
+    def test_shipped_migrations_load(self):
+        migrations = load_migrations()
+        self.assertTrue(migrations)
+        self.assertTrue(all(migration.statements for migration in migrations))
+
+    def test_init_db_records_every_shipped_migration(self):
+        with open(os.path.join(os.path.dirname(MIGRATIONS_DIR), 'init_db.sql')) as init_db_file:
+            init_db = init_db_file.read()
+
+        for shipped in load_migrations():
+            self.assertIn(f"({shipped.version}, '{shipped.name}')", init_db)
+
+
+class TestConcurrentIndexStatement(unittest.IsolatedAsyncioTestCase):
+    STATEMENT = 'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS a_uniq_idx ON public.a ("b")'
+
+    async def test_invalid_index_is_dropped_before_the_build(self):
+        connection = AsyncMock()
+        with patch.object(migration, '_index_is_valid', AsyncMock(side_effect=[False, True])):
+            await migration._run_no_transaction_statement(connection, self.STATEMENT)
+
+        self.assertEqual([call.args[0] for call in connection.exec_driver_sql.await_args_list],
+                         ["DROP INDEX CONCURRENTLY IF EXISTS a_uniq_idx", self.STATEMENT])
+
+    async def test_failed_build_drops_the_leftover_and_raises(self):
+        connection = AsyncMock()
+        connection.exec_driver_sql.side_effect = [Exception("duplicate key"), None]
+        with patch.object(migration, '_index_is_valid', AsyncMock(return_value=None)):
+            with self.assertRaises(Exception):
+                await migration._run_no_transaction_statement(connection, self.STATEMENT)
+
+        self.assertEqual(connection.exec_driver_sql.await_args_list[-1].args[0],
+                         "DROP INDEX CONCURRENTLY IF EXISTS a_uniq_idx")
+
+    async def test_index_not_valid_after_build_fails_loudly(self):
+        connection = AsyncMock()
+        with patch.object(migration, '_index_is_valid', AsyncMock(side_effect=[None, False])):
+            with self.assertRaises(MigrationException):
+                await migration._run_no_transaction_statement(connection, self.STATEMENT)
+
+    async def test_other_statements_run_as_is(self):
+        connection = AsyncMock()
+        with patch.object(migration, '_index_is_valid', AsyncMock()) as index_is_valid:
+            await migration._run_no_transaction_statement(connection, "DROP INDEX CONCURRENTLY IF EXISTS a_idx")
+
+        connection.exec_driver_sql.assert_awaited_once_with("DROP INDEX CONCURRENTLY IF EXISTS a_idx")
+        index_is_valid.assert_not_awaited()
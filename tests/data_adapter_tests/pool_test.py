@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import MagicMock
+
+from data_adapter.pool import PoolCheckoutStats, InstrumentedAsyncQueuePool
+
+
+class TestPoolCheckoutStats(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = PoolCheckoutStats()
+
+    def test_record_wait_times_in_buckets(self):
+        self.stats.record(0.5)
+        self.stats.record(7)
+        self.stats.record(9000)
+
+        stats = self.stats.to_dict()
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertEqual(stats["wait_ms_histogram"]["le_1ms"], 1)
+        self.assertEqual(stats["wait_ms_histogram"]["le_10ms"], 1)
+        self.assertEqual(stats["wait_ms_histogram"]["inf"], 1)
+        self.assertEqual(stats["max_wait_ms"], 9000)
+
+    def test_record_timeout(self):
+        self.stats.record(30000, timed_out=True)
+
+        stats = self.stats.to_dict()
+        self.assertEqual(stats["checkouts"], 0)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["avg_wait_ms"], 30000)
+
+
+class TestInstrumentedAsyncQueuePool(unittest.TestCase):
+
+    def test_every_pool_keeps_its_own_stats_across_recreation(self):
+        first = InstrumentedAsyncQueuePool(MagicMock(), pool_size=1)
+        second = InstrumentedAsyncQueuePool(MagicMock(), pool_size=1)
+        first.checkout_stats.record(3)
+
+        recreated = first.recreate()
+
+        self.assertEqual(recreated.stats()["checkouts"], 1)
+        self.assertEqual(second.stats()["checkouts"], 0)
+        self.assertEqual(recreated.stats().keys(), second.stats().keys())
@@ -0,0 +1,41 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from data_adapter.query_stats import instrument_query_stats
+from tests.query_budget import assert_query_budget
+
+
+class TestQueryStats(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        instrument_query_stats(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_statements_are_counted(self):
+        with assert_query_budget(self, 3) as stats, self.engine.connect() as connection:
+            connection.execute(text("select 1"))
+            connection.execute(text("select 2"))
+        self.assertEqual(stats.queries, 2)
+        self.assertGreater(stats.db_time_ms, 0)
+
+    def test_failed_statements_are_counted(self):
+        with assert_query_budget(self, 1) as stats, self.engine.connect() as connection:
+            with self.assertRaises(OperationalError):
+                connection.execute(text("select * from missing_table"))
+            self.assertEqual(connection.connection.info.get("query_start_time"), [])
+        self.assertEqual(stats.queries, 1)
+
+    def test_statements_outside_a_request_are_ignored(self):
+        with self.engine.connect() as connection:
+            connection.execute(text("select 1"))
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(AssertionError):
+            with assert_query_budget(self, 1), self.engine.connect() as connection:
+                connection.execute(text("select 1"))
+                connection.execute(text("select 2"))
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from sqlalchemy import create_engine, select, update
+
+from data_adapter.db import RoutingSession, SESSION_INFO_USE_REPLICA, SESSION_INFO_READ_ONLY
+from data_adapter.inventory import Item
+from utils.exceptions import ReadOnlySessionException
+
+
+class TestRoutingSession(unittest.TestCase):
+
+    def setUp(self):
+        self.primary = create_engine("sqlite://")
+        self.replica = MagicMock()
+        self.read_only_replica = MagicMock()
+        self.read_only = MagicMock()
+        engines = {'replica_db_engine': self.replica, 'read_only_replica_db_engine': self.read_only_replica,
+                   'read_only_db_engine': self.read_only}
+        for name, engine in engines.items():
+            patcher = patch(f'data_adapter.db.{name}', engine)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reads_of_read_only_session_go_to_replica(self):
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_USE_REPLICA: True})
+
+        self.assertIs(session.get_bind(clause=select(Item)), self.replica.sync_engine)
+
+    def test_reads_after_write_go_to_primary(self):
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_USE_REPLICA: True})
+
+        self.assertIs(session.get_bind(clause=update(Item).values(quantity=1)), self.primary)
+        self.assertIs(session.get_bind(clause=select(Item)), self.primary)
+
+    def test_locking_reads_go_to_primary(self):
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_USE_REPLICA: True})
+
+        self.assertIs(session.get_bind(clause=select(Item).with_for_update()), self.primary)
+
+    def test_reads_of_other_sessions_go_to_primary(self):
+        session = RoutingSession(bind=self.primary)
+
+        self.assertIs(session.get_bind(clause=select(Item)), self.primary)
+
+    def test_read_only_session_reads_in_read_only_transactions(self):
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_READ_ONLY: True})
+        self.assertIs(session.get_bind(clause=select(Item)), self.read_only.sync_engine)
+
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_READ_ONLY: True, SESSION_INFO_USE_REPLICA: True})
+        self.assertIs(session.get_bind(clause=select(Item)), self.read_only_replica.sync_engine)
+
+    def test_read_only_session_rejects_writes(self):
+        session = RoutingSession(bind=self.primary, info={SESSION_INFO_READ_ONLY: True})
+
+        with self.assertRaises(ReadOnlySessionException):
+            session.get_bind(clause=update(Item).values(quantity=1))
+        with self.assertRaises(ReadOnlySessionException):
+            session.get_bind(clause=select(Item).with_for_update())
+
+
+class TestReadOnlyEngines(unittest.TestCase):
+
+    def test_read_only_engine_shares_primary_pool(self):
+        from data_adapter.db import db_engine, read_only_db_engine
+
+        self.assertIs(read_only_db_engine.sync_engine.pool, db_engine.sync_engine.pool)
+        self.assertTrue(read_only_db_engine.sync_engine.get_execution_options()['postgresql_readonly'])
@@ -0,0 +1,72 @@
+import time
+import unittest
+import uuid
+from unittest.mock import patch, MagicMock
+
+from config.settings import Auth
+from controller.context_manager import build_request_context, context_actor_user_data
+from data_adapter.user import User, revoke_user, revoked_users
+from models.user import UserTokenData, UserRole
+from utils.cache import RevocationList
+from utils.exceptions import AuthException
+
+
+class TestRevocationList(unittest.TestCase):
+
+    def test_tokens_issued_up_to_revocation_are_revoked(self):
+        revocation_list = RevocationList(ttl_seconds=60)
+        revoked_at = time.time()
+        revocation_list.revoke("user", revoked_at)
+
+        self.assertTrue(revocation_list.is_revoked("user", revoked_at - 1))
+        self.assertTrue(revocation_list.is_revoked("user", None))
+        self.assertFalse(revocation_list.is_revoked("user", revoked_at + 1))
+        self.assertFalse(revocation_list.is_revoked("other user", revoked_at - 1))
+
+    def test_revocation_expires_with_the_tokens(self):
+        revocation_list = RevocationList(ttl_seconds=60)
+        revocation_list.revoke("user", time.time() - 61)
+
+        self.assertFalse(revocation_list.is_revoked("user", None))
+        revocation_list.revoke("other user", time.time())
+        self.assertEqual(revocation_list.stats()['size'], 1)
+
+
+class TestStatelessAuth(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        revoked_users.clear()
+        self.addCleanup(revoked_users.clear)
+        patcher = patch.object(Auth, 'stateless_enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(User, 'get_status_by_uuid')
+        self.mock_get_status_by_uuid = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user_uuid = str(uuid.uuid4())
+        self.request = MagicMock(headers={})
+
+    def set_token(self, issued_at: float):
+        token = context_actor_user_data.set(UserTokenData(uuid=self.user_uuid, role=UserRole.CUSTOMER,
+                                                          email="johndoe@example.com", iat=issued_at))
+        self.addCleanup(context_actor_user_data.reset, token)
+
+    async def test_token_is_trusted_without_reading_user(self):
+        self.set_token(time.time())
+
+        await build_request_context(self.request, db=MagicMock())
+
+        self.mock_get_status_by_uuid.assert_not_awaited()
+
+    async def test_token_of_revoked_user_is_rejected(self):
+        self.set_token(time.time() - 1)
+        revoke_user(f"{self.user_uuid} {time.time()}")
+
+        with self.assertRaises(AuthException):
+            await build_request_context(self.request, db=MagicMock())
+
+    async def test_token_issued_after_revocation_is_accepted(self):
+        revoke_user(f"{self.user_uuid} {time.time() - 10}")
+        self.set_token(time.time())
+
+        await build_request_context(self.request, db=MagicMock())
@@ -0,0 +1,47 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from data_adapter.notifications import notification_listener, USER_CHANGED_CHANNEL
+from data_adapter.user import User, user_status_cache
+from models.user import UserRole, UserStatus
+
+
+class TestUserStatusCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        user_status_cache.clear()
+        self.addCleanup(user_status_cache.clear)
+        self.user_uuid = str(uuid.uuid4())
+        row = SimpleNamespace(role=UserRole.CUSTOMER.value, status=UserStatus.ACTIVE.value)
+        self.db = MagicMock()
+        self.db.execute = AsyncMock(return_value=MagicMock(first=MagicMock(return_value=row), rowcount=1))
+        self.db.flush = AsyncMock()
+        patcher = patch('controller.context_manager.get_db_session', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_status_is_read_once(self):
+        first = await User.get_status_by_uuid(self.user_uuid)
+        second = await User.get_status_by_uuid(self.user_uuid.upper())
+
+        self.assertEqual(first.status, UserStatus.ACTIVE)
+        self.assertIs(first, second)
+        self.db.execute.assert_awaited_once()
+
+    @patch('data_adapter.user.notify')
+    async def test_update_drops_status_and_notifies_workers(self, mock_notify):
+        await User.get_status_by_uuid(self.user_uuid)
+
+        await User.update_user_by_uuid(user_uuid=self.user_uuid, update_dict={User.status: UserStatus.SUSPENDED})
+
+        self.assertIsNone(user_status_cache.get(self.user_uuid))
+        mock_notify.assert_awaited_once_with(USER_CHANGED_CHANNEL, self.user_uuid)
+
+    async def test_notification_drops_status(self):
+        await User.get_status_by_uuid(self.user_uuid)
+
+        notification_listener._dispatch(None, 0, USER_CHANGED_CHANNEL, self.user_uuid)
+
+        self.assertIsNone(user_status_cache.get(self.user_uuid))
@@ -0,0 +1,89 @@
+import unittest
+from contextlib import contextmanager
+from typing import List
+
+from controller.context_manager import context_db_query_stats
+from data_adapter.query_stats import DBQueryStats
+from server.middleware import HEADER_DB_QUERY_COUNT
+
+
+@contextmanager
+def assert_query_budget(test_case: unittest.TestCase, max_queries: int):
+    """
+    fails the test when the code run inside the block executes more db statements than max_queries ,
+    use it around endpoint or service calls to pin their query count
+    """
+    stats = DBQueryStats()
+    token = context_db_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        context_db_query_stats.reset(token)
+    test_case.assertLessEqual(stats.queries, max_queries,
+                              f"ran {stats.queries} db statements , budget is {max_queries}")
+
+
+def assert_response_query_budget(test_case: unittest.TestCase, response, max_queries: int):
+    """
+    fails the test when the request of a test client response executed more db statements than max_queries ,
+    counted by DBQueryStatsMiddleware into the x-db-query-count header
+    """
+    queries = int(response.headers[HEADER_DB_QUERY_COUNT.decode()])
+    test_case.assertLessEqual(queries, max_queries, f"ran {queries} db statements , budget is {max_queries}")
+
+
+class ScriptedResult:
+    """result of a statement run on a RecordingSession , holding the rows the test scripted for it"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.rowcount = len(self.rows)
+
+    def unique(self):
+        return self
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.first()
+
+    def all(self):
+        return self.rows
+
+
+class RecordingSession:
+    """
+    stands in for the request db session of an endpoint , answers its statements with the scripted results in order
+    and counts them into the query stats of the request as the engine instrumentation does. a statement beyond the
+    script fails the request
+    """
+
+    def __init__(self, results: List[ScriptedResult]):
+        self.results = list(results)
+        self.statements = []
+        self.info = {}
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        stats = context_db_query_stats.get()
+        if stats is not None:
+            stats.record(0)
+        if not self.results:
+            raise AssertionError(f"unexpected db statement {statement}")
+        return self.results.pop(0)
+
+    async def flush(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
@@ -0,0 +1,100 @@
+import http
+import unittest
+import uuid
+from unittest.mock import MagicMock, patch
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from models.cart import CartItemQuantity
+from models.user import UserRole
+from server.auth import authenticate_token, compile_rbac_route_table, match_rbac_route, rbac_access_checker, \
+    RBACResource, RBACAccessType
+from server.middleware import AuthMiddleware
+from utils.jwt_token_handler import JWTHandler
+
+
+class TestAuthMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.endpoint_calls = MagicMock()
+        router = APIRouter(prefix="/v1/cart")
+
+        @router.post("/item/{item_uuid}")
+        @rbac_access_checker(resource=RBACResource.cart, rbac_access_type=RBACAccessType.write)
+        async def add_item(item_uuid: str, quantity: CartItemQuantity):
+            self.endpoint_calls(item_uuid, quantity)
+            return {"quantity": quantity.quantity}
+
+        app = FastAPI()
+        app.add_middleware(AuthMiddleware)
+        app.include_router(router, dependencies=[Depends(authenticate_token)])
+        self.client = TestClient(app)
+
+    def token(self, role: UserRole) -> dict:
+        token = JWTHandler.create_access_token({"uuid": str(uuid.uuid4()), "role": role.value,
+                                                "email": "johndoe@example.com"})
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_allowed_role_is_let_through(self):
+        response = self.client.post("/v1/cart/item/abc", json={"quantity": 2}, headers=self.token(UserRole.CUSTOMER))
+
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        self.assertEqual(response.json(), {"quantity": 2})
+
+    def test_token_is_decoded_once(self):
+        headers = self.token(UserRole.CUSTOMER)
+        with patch.object(JWTHandler, 'decode_access_token', wraps=JWTHandler.decode_access_token) as mock_decode:
+            response = self.client.post("/v1/cart/item/abc", json={"quantity": 2}, headers=headers)
+
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        mock_decode.assert_called_once()
+
+    def test_forbidden_role_is_rejected_before_the_body_is_read(self):
+        response = self.client.post("/v1/cart/item/abc", json={"quantity": 0}, headers=self.token(UserRole.ADMIN))
+
+        self.assertEqual(response.status_code, http.HTTPStatus.FORBIDDEN)
+        self.assertIn("not allowed", response.json()["error"])
+        self.endpoint_calls.assert_not_called()
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.post("/v1/cart/item/abc", data="not json", headers={"Authorization": "Bearer invalid"})
+
+        self.assertEqual(response.status_code, http.HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response.json()["error"], "Invalid authentication credentials")
+
+    def test_missing_token_is_rejected_as_oauth2_does(self):
+        response = self.client.post("/v1/cart/item/abc", json={"quantity": 2})
+
+        self.assertEqual(response.status_code, http.HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response.json(), {"detail": "Not authenticated"})
+        self.assertEqual(response.headers["WWW-Authenticate"], "Bearer")
+
+    def test_unknown_route_is_left_to_the_router(self):
+        self.assertEqual(self.client.get("/v1/cart/item/abc").status_code, http.HTTPStatus.METHOD_NOT_ALLOWED)
+        self.assertEqual(self.client.get("/v1/unknown").status_code, http.HTTPStatus.NOT_FOUND)
+
+
+class TestRBACRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        from server.app import app
+        self.route_table = compile_rbac_route_table(app.routes)
+
+    def test_routes_of_app_are_compiled(self):
+        export = match_rbac_route(self.route_table, "GET", "/v1/inventory/items/export")
+        self.assertTrue(export.authenticated)
+        self.assertEqual(export.resource, RBACResource.inventory_export)
+        self.assertEqual(export.roles, {UserRole.ADMIN})
+
+        add_item = match_rbac_route(self.route_table, "POST", f"/v1/cart/item/{uuid.uuid4()}")
+        self.assertEqual(add_item.roles, {UserRole.CUSTOMER})
+
+        for path in ("/poolstatus", "/cachestatus"):
+            status = match_rbac_route(self.route_table, "GET", path)
+            self.assertTrue(status.authenticated)
+            self.assertEqual(status.roles, {UserRole.ADMIN})
+        self.assertFalse(match_rbac_route(self.route_table, "GET", "/status").authenticated)
+
+        self.assertFalse(match_rbac_route(self.route_table, "POST", "/v1/user/login").authenticated)
+        self.assertIsNone(match_rbac_route(self.route_table, "PUT", "/v1/cart"))
@@ -0,0 +1,86 @@
+import http
+import unittest
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from data_adapter.cart import CustomerCart, CartItem
+from data_adapter.db import get_db
+from data_adapter.inventory import Item, item_metadata_cache
+from data_adapter.user import User, user_status_cache
+from models.inventory import ItemCategory
+from models.user import UserRole, UserStatus
+from server.app import app
+from tests.query_budget import assert_response_query_budget, RecordingSession, ScriptedResult
+from utils.jwt_token_handler import JWTHandler
+
+
+class TestCartQueryBudget(unittest.TestCase):
+    """statements run by the cart endpoints , a change adding db round trips to them has to update the budget here"""
+
+    def setUp(self):
+        user_status_cache.clear()
+        item_metadata_cache.clear()
+        self.addCleanup(user_status_cache.clear)
+        self.addCleanup(item_metadata_cache.clear)
+        self.session = None
+
+        async def recording_db():
+            yield self.session
+
+        app.dependency_overrides[get_db] = recording_db
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+        self.user_uuid = str(uuid.uuid4())
+        token = JWTHandler.create_access_token({"uuid": self.user_uuid, "role": UserRole.CUSTOMER.value,
+                                                "email": "johndoe@example.com"})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        now = datetime.now(timezone.utc)
+        self.db_fields = dict(created_at=now, updated_at=now, is_deleted=False)
+        self.item = dict(id=7, uuid=uuid.uuid4(), category=ItemCategory.BOOKS.value, name="Book", description=None,
+                         price=10.0, image=None, **self.db_fields)
+        self.user_status = ScriptedResult([SimpleNamespace(role=UserRole.CUSTOMER.value,
+                                                           status=UserStatus.ACTIVE.value)])
+
+    def test_add_item_already_in_cart(self):
+        customer = User(id=3, uuid=uuid.UUID(self.user_uuid), first_name="John", last_name="Doe",
+                        email="johndoe@example.com", role=UserRole.CUSTOMER.value, status=UserStatus.ACTIVE.value,
+                        password_hash="hash", **self.db_fields)
+        cart_item = CartItem(id=5, uuid=uuid.uuid4(), cart_id=1, item_id=self.item["id"], quantity_in_cart=1,
+                             original_item=Item(quantity=4, **self.item), **self.db_fields)
+        cart = CustomerCart(id=1, uuid=uuid.uuid4(), customer_id=customer.id, customer=customer,
+                            cart_items=[cart_item], **self.db_fields)
+        self.session = RecordingSession([
+            self.user_status,
+            ScriptedResult([cart]),
+            ScriptedResult([SimpleNamespace(**self.item)]),
+            ScriptedResult([3]),
+            ScriptedResult(),
+        ])
+
+        response = self.client.post(f"/v1/cart/item/{self.item['uuid']}", json={"quantity": 1},
+                                    headers=self.headers)
+
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        self.assertEqual(response.json()["data"]["cart_items"][0]["quantity_in_cart"], 2)
+        assert_response_query_budget(self, response, 5)
+
+    def test_get_cart(self):
+        row = SimpleNamespace(id=1, first_name="John", last_name="Doe", email="johndoe@example.com",
+                              role=UserRole.CUSTOMER.value, cart_item_uuid=uuid.uuid4(), quantity_in_cart=2,
+                              quantity=4, total_price=20.0,
+                              **{key: self.item[key] for key in ("uuid", "category", "name", "description", "price",
+                                                                 "image")})
+        self.session = RecordingSession([
+            self.user_status,
+            ScriptedResult([(1, self.item["updated_at"], self.item["updated_at"], 1, None, None)]),
+            ScriptedResult([row]),
+        ])
+
+        response = self.client.get("/v1/cart", headers=self.headers)
+
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        self.assertEqual(response.json()["data"]["total_price"], 20.0)
+        assert_response_query_budget(self, response, 3)
@@ -0,0 +1,46 @@
+import unittest
+import uuid
+from unittest.mock import patch
+
+from controller.context_manager import context_actor_user_data
+from data_adapter.cart import CustomerCart
+from data_adapter.inventory import InventoryVersion
+from models.user import UserTokenData
+from service.cart_service import CartService
+from service.inventory_service import InventoryService
+from utils.helper import etag_matches
+
+
+class TestConditionalGet(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        context_actor_user_data.set(
+            UserTokenData(uuid=str(uuid.uuid4()), role="customer", email="johndoe@example.com"))
+
+    @patch.object(InventoryVersion, 'get_versions')
+    async def test_inventory_etag_follows_inventory_version_and_stock_stamp(self, mock_get_versions):
+        mock_get_versions.return_value = (7, 3)
+
+        self.assertEqual(await InventoryService.get_inventory_etag(), 'W/"inventory-7-3"')
+
+    @patch.object(CustomerCart, 'get_cart_version')
+    async def test_cart_etag(self, mock_get_cart_version):
+        mock_get_cart_version.return_value = "abc"
+
+        self.assertEqual(await CartService.get_cart_etag(), 'W/"cart-abc"')
+        mock_get_cart_version.assert_called_once_with(context_actor_user_data.get().uuid)
+
+    @patch.object(CustomerCart, 'get_cart_version')
+    async def test_no_cart_has_no_etag(self, mock_get_cart_version):
+        mock_get_cart_version.return_value = None
+
+        self.assertIsNone(await CartService.get_cart_etag())
+
+    def test_etag_matches(self):
+        etag = 'W/"inventory-7"'
+        self.assertTrue(etag_matches('W/"inventory-7"', etag))
+        self.assertTrue(etag_matches('"inventory-7"', etag))
+        self.assertTrue(etag_matches('"other", W/"inventory-7"', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches('W/"inventory-6"', etag))
+        self.assertFalse(etag_matches(None, etag))
@@ -1,14 +1,19 @@
+import json
 import unittest
 import uuid
+from datetime import datetime, timezone
 from unittest.mock import patch
 
+from config.settings import Inventory
 from data_adapter.inventory import Item
-from models.base import GenericResponseModel
-from models.inventory import ItemModel, ItemInsertModel, ItemCategory
+from models.base import GenericResponseModel, KeysetCursor
+from models.inventory import ItemModel, ItemInsertModel, ItemCategory, ItemPageResponseModel, ExportFormat, \
+    ImportConflictAction, ItemResponseModel
 from service.inventory_service import InventoryService
+from utils.helper import iter_lines
 
 
-class TestInventoryService(unittest.TestCase):
+class TestInventoryService(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
         self.item_insert_model = ItemInsertModel(
@@ -20,14 +25,11 @@ class TestInventoryService(unittest.TestCase):
             quantity=10
         )
 
-    @patch.object(Item, 'get_all_items')
-    def test_get_all_items_in_inventory_success(self, mock_get_all_items):
+    @patch.object(Item, 'get_items_page')
+    async def test_get_items_in_inventory_success(self, mock_get_items_page):
         mock_items = [
-            ItemModel(
-                id=1,
+            ItemResponseModel(
                 uuid=uuid.uuid4(),
-                created_at="2023-04-09T14:53:10.285Z",
-                is_deleted=False,
                 category=ItemCategory.ELECTRONICS,
                 name="Laptop",
                 price=1000.00,
@@ -35,11 +37,8 @@ class TestInventoryService(unittest.TestCase):
                 image="https://example.com/image.jpg",
                 quantity=10
             ),
-            ItemModel(
-                id=2,
+            ItemResponseModel(
                 uuid=uuid.uuid4(),
-                created_at="2023-04-09T14:53:10.285Z",
-                is_deleted=False,
                 category=ItemCategory.ELECTRONICS,
                 name="Television",
                 price=500.00,
@@ -48,23 +47,52 @@ class TestInventoryService(unittest.TestCase):
                 quantity=5
             )
         ]
-        mock_get_all_items.return_value = mock_items
+        mock_get_items_page.return_value = (mock_items, None)
 
         expected_response = GenericResponseModel(
             status_code=200,
-            data=[
-                mock_items[0].build_response_model(),
-                mock_items[1].build_response_model()
-            ]
+            data=ItemPageResponseModel(items=mock_items)
         )
 
-        response = InventoryService.get_all_items_in_inventory()
+        response = await InventoryService.get_items_in_inventory(limit=10)
         self.assertEqual(response.status_code, expected_response.status_code)
         self.assertEqual(response.data, expected_response.data)
+        self.assertIsNone(response.data.next_cursor)
+        mock_get_items_page.assert_called_once_with(limit=10, after=None, filters=None)
 
-    @patch.object(Item, 'get_all_items')
-    def test_get_all_items_in_inventory_not_found(self, mock_get_all_items):
-        mock_get_all_items.return_value = []
+    @patch.object(Item, 'get_items_page')
+    async def test_get_items_in_inventory_next_page(self, mock_get_items_page):
+        mock_items = [
+            ItemResponseModel(
+                uuid=uuid.uuid4(),
+                category=ItemCategory.BOOKS,
+                name=f"Book {item_id}",
+                price=10.00,
+                quantity=5
+            ) for item_id in range(1, 3)
+        ]
+        next_cursor = KeysetCursor(created_at="2023-04-09T14:53:10.285Z", id=2)
+        mock_get_items_page.return_value = (mock_items, next_cursor)
+        after = KeysetCursor(created_at="2023-04-09T14:53:10.285Z", id=0)
+
+        response = await InventoryService.get_items_in_inventory(limit=2, after=after.encode())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.items, mock_items)
+        self.assertEqual(KeysetCursor.decode(response.data.next_cursor), next_cursor)
+        mock_get_items_page.assert_called_once_with(limit=2, after=after, filters=None)
+
+    @patch.object(Item, 'get_items_page')
+    async def test_get_items_in_inventory_invalid_cursor(self, mock_get_items_page):
+        response = await InventoryService.get_items_in_inventory(limit=2, after="not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.error, InventoryService.ERROR_INVALID_CURSOR)
+        mock_get_items_page.assert_not_called()
+
+    @patch.object(Item, 'get_items_page')
+    async def test_get_items_in_inventory_not_found(self, mock_get_items_page):
+        mock_get_items_page.return_value = ([], None)
 
         expected_response = GenericResponseModel(
             status_code=404,
@@ -72,14 +100,14 @@ class TestInventoryService(unittest.TestCase):
             data=[]
         )
 
-        response = InventoryService.get_all_items_in_inventory()
+        response = await InventoryService.get_items_in_inventory(limit=10)
         self.assertEqual(response.status_code, expected_response.status_code)
         self.assertEqual(response.error, expected_response.error)
         self.assertEqual(response.data, expected_response.data)
 
     @patch.object(Item, 'get_by_name_and_category')
     @patch.object(Item, 'create_item')
-    def test_add_item_to_inventory_success(self, mock_create_item, mock_get_by_name_and_category):
+    async def test_add_item_to_inventory_success(self, mock_create_item, mock_get_by_name_and_category):
         mock_get_by_name_and_category.return_value = None
         mock_create_item.return_value = ItemModel(
             id=2,
@@ -99,12 +127,12 @@ class TestInventoryService(unittest.TestCase):
             data=mock_create_item.return_value.build_response_model()
         )
 
-        response = InventoryService.add_item_to_inventory(self.item_insert_model)
+        response = await InventoryService.add_item_to_inventory(self.item_insert_model)
         self.assertEqual(response.status_code, expected_response.status_code)
         self.assertEqual(response.data, expected_response.data)
 
     @patch.object(Item, 'get_by_name_and_category')
-    def test_add_item_to_inventory_conflict(self, mock_get_by_name_and_category):
+    async def test_add_item_to_inventory_conflict(self, mock_get_by_name_and_category):
         mock_item = ItemModel(
             id=2,
             uuid=uuid.uuid4(),
@@ -124,12 +152,115 @@ class TestInventoryService(unittest.TestCase):
             error=InventoryService.ERROR_ITEM_ALREADY_IN_INVENTORY
         )
 
-        response = InventoryService.add_item_to_inventory(self.item_insert_model)
+        response = await InventoryService.add_item_to_inventory(self.item_insert_model)
         self.assertEqual(response.status_code, expected_response.status_code)
         self.assertEqual(response.error, expected_response.error)
         self.assertEqual(response.data, expected_response.data)
 
-    def test_inventory_item_add(self):
+    async def _export(self, export_format: ExportFormat, batches) -> str:
+        async def stream_items(batch_size):
+            for batch in batches:
+                yield batch
+
+        with patch.object(Item, 'stream_items', side_effect=stream_items):
+            return "".join([chunk async for chunk in InventoryService.export_items(export_format)])
+
+    async def test_export_items_ndjson(self):
+        item_uuid = uuid.uuid4()
+        created_at = datetime(2023, 4, 9, 14, 53, 10, tzinfo=timezone.utc)
+        item = dict(uuid=item_uuid, category="books", name="Book", description=None, price=10.5, image=None,
+                    quantity=2, created_at=created_at, updated_at=created_at)
+
+        exported = await self._export(ExportFormat.NDJSON, [[item], [dict(item, name="Book 2")]])
+
+        lines = exported.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["uuid"], str(item_uuid))
+        self.assertEqual(json.loads(lines[0])["created_at"], created_at.isoformat())
+        self.assertEqual(json.loads(lines[1])["name"], "Book 2")
+
+    async def test_export_items_csv(self):
+        created_at = datetime(2023, 4, 9, 14, 53, 10, tzinfo=timezone.utc)
+        item = dict(uuid=uuid.uuid4(), category="books", name="Book, Vol 1", description=None, price=10.5,
+                    image=None, quantity=2, created_at=created_at, updated_at=created_at)
+
+        exported = await self._export(ExportFormat.CSV, [[item]])
+
+        lines = exported.splitlines()
+        self.assertEqual(lines[0], ",".join(InventoryService.EXPORT_COLUMNS))
+        self.assertIn('"Book, Vol 1"', lines[1])
+        self.assertEqual(len(lines), 2)
+
+    async def _import(self, import_format: ExportFormat, body: bytes, on_conflict=ImportConflictAction.SKIP,
+                      written=None) -> (GenericResponseModel, list):
+        async def chunks():
+            # split the body to make records straddle chunks
+            for start in range(0, len(body), 7):
+                yield body[start:start + 7]
+
+        with patch.object(Item, 'bulk_upsert_items', return_value=written or []) as mock_bulk_upsert_items:
+            response = await InventoryService.import_items(iter_lines(chunks()), import_format, on_conflict)
+        return response, mock_bulk_upsert_items.call_args_list
+
+    async def test_import_items_ndjson(self):
+        body = b"\n".join([
+            json.dumps(dict(category="books", name="Book", price=10.5, quantity=2)).encode(),
+            b"not json",
+            json.dumps(dict(category="books", name="Book 2", price=-1)).encode(),
+            json.dumps(dict(category="books", name="Book", price=12)).encode(),
+            b"",
+        ])
+
+        response, calls = await self._import(ExportFormat.NDJSON, body, on_conflict=ImportConflictAction.UPDATE,
+                                             written=[("Book", "books", False)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([item["name"] for item in calls[0].args[0]], ["Book"])
+        self.assertTrue(calls[0].kwargs["update_existing"])
+        report = response.data
+        self.assertEqual((report.received, report.created, report.updated, report.skipped, report.failed),
+                         (4, 0, 1, 0, 3))
+        self.assertEqual([error.row for error in report.errors], [2, 3, 4])
+        self.assertIn("price", report.errors[1].errors[0])
+
+    async def test_import_items_csv(self):
+        body = (b'category,name,price,description,quantity\r\n'
+                b'books,"Book, Vol 1",10.5,"two\nlines",\r\n'
+                b'toys,Ball,2\r\n'
+                b'toys,Kite,3,,4\r\n')
+
+        response, calls = await self._import(ExportFormat.CSV, body, written=[("Book, Vol 1", "books", True)])
+
+        items = calls[0].args[0]
+        self.assertEqual([item["name"] for item in items], ["Book, Vol 1", "Kite"])
+        self.assertEqual(items[0]["description"], "two\nlines")
+        self.assertEqual(items[0]["quantity"], 0)
+        self.assertFalse(calls[0].kwargs["update_existing"])
+        report = response.data
+        self.assertEqual((report.received, report.created, report.updated, report.skipped, report.failed),
+                         (3, 1, 0, 1, 1))
+        self.assertEqual(report.errors[0].row, 2)
+
+    async def test_import_batches_stay_under_bind_parameter_limit(self):
+        body = b"\n".join(json.dumps(dict(category="books", name=f"Book {index}", price=1)).encode()
+                          for index in range(5))
+
+        with patch.object(Inventory, 'import_batch_size', 100000), \
+                patch.object(Item, 'get_max_bulk_upsert_rows', return_value=2):
+            response, calls = await self._import(ExportFormat.NDJSON, body)
+
+        self.assertEqual([len(call.args[0]) for call in calls], [2, 2, 1])
+        self.assertLessEqual(Item.get_max_bulk_upsert_rows() * len(Item.__table__.columns), 32767)
+
+    async def test_import_items_empty(self):
+        response, calls = await self._import(ExportFormat.CSV, b"category,name,price\n")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.error, InventoryService.ERROR_EMPTY_IMPORT)
+        self.assertEqual(calls, [])
+
+    async def test_inventory_item_add(self):
         with self.assertRaises(ValueError):
             ItemModel(
                 id=2,
@@ -0,0 +1,91 @@
+import gzip
+import json
+import unittest
+import uuid
+from http import HTTPStatus
+from unittest.mock import patch
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config.settings import Inventory
+from data_adapter.inventory import InventoryVersion
+from models.base import GenericResponseModel
+from models.inventory import ItemFilterModel, ItemPageResponseModel, ItemResponseModel, ItemCategory
+from service.inventory_service import InventoryService
+from service.inventory_snapshot import InventorySnapshot
+
+
+class TestInventorySnapshot(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.snapshot = InventorySnapshot()
+        self.filters = ItemFilterModel()
+        item = ItemResponseModel(uuid=uuid.uuid4(), category=ItemCategory.BOOKS, name="Book é", price=10.5,
+                                 quantity=3)
+        self.page = GenericResponseModel(status_code=HTTPStatus.OK,
+                                         data=ItemPageResponseModel(items=[item], next_cursor=None))
+        patcher = patch.object(InventoryVersion, 'get_versions', return_value=(1, 0))
+        self.mock_get_versions = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(InventoryService, 'get_items_in_inventory',
+                               side_effect=lambda **_: self.page.copy(deep=True))
+        self.mock_get_items = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def get(self, if_none_match=None, accept_encoding=None):
+        return await self.snapshot.get_items_response(limit=10, after=None, filters=self.filters,
+                                                      if_none_match=if_none_match, accept_encoding=accept_encoding)
+
+    async def test_page_is_read_once_per_version(self):
+        await self.get()
+        response = await self.get()
+
+        self.mock_get_items.assert_called_once()
+        self.assertEqual(response.headers['etag'], 'W/"inventory-1-0"')
+
+        self.snapshot.observe_version(2)
+        self.mock_get_versions.return_value = (2, 5)
+        response = await self.get()
+
+        self.assertEqual(self.mock_get_items.call_count, 2)
+        self.assertEqual(response.headers['etag'], 'W/"inventory-2-5"')
+
+    @patch.object(Inventory, 'snapshot_refresh_seconds', 0)
+    async def test_page_is_read_again_after_a_stock_change(self):
+        await self.get()
+        await self.get()
+        self.mock_get_items.assert_called_once()
+
+        self.mock_get_versions.return_value = (1, 1)
+        response = await self.get()
+
+        self.assertEqual(self.mock_get_items.call_count, 2)
+        self.assertEqual(response.headers['etag'], 'W/"inventory-1-1"')
+
+    async def test_body_matches_json_response(self):
+        response = await self.get()
+        gzipped = await self.get(accept_encoding="gzip, deflate")
+
+        expected = json.loads(JSONResponse(content=jsonable_encoder(self.page)).body)
+        body = json.loads(response.body)
+        self.assertTrue(body.pop('api_id'))
+        expected.pop('api_id')
+        self.assertEqual(body, expected)
+        self.assertEqual(gzipped.headers['content-encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(gzipped.body))['data'], expected['data'])
+
+    async def test_current_etag_is_not_modified(self):
+        response = await self.get(if_none_match='W/"inventory-1-0"')
+
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.mock_get_items.assert_not_called()
+
+    async def test_error_page_is_not_kept(self):
+        self.page = GenericResponseModel(status_code=HTTPStatus.NOT_FOUND, error="No items found in inventory")
+
+        response = await self.get()
+        await self.get()
+
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.mock_get_items.call_count, 2)
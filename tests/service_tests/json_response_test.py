@@ -0,0 +1,51 @@
+import http
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.base import GenericResponseModel
+from models.cart import CartItemResponseModel, CartResponseModel
+from models.inventory import ItemCategory, ItemPageResponseModel, ItemResponseModel
+from models.user import UserResponseModel, UserRole
+from utils.helper import build_api_response, render_json
+
+
+class TestRenderJSON(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.item = ItemResponseModel(uuid=uuid.uuid4(), category=ItemCategory.BOOKS, name="Book é ✓", price=10.5,
+                                      quantity=3, description="a \"quoted\" book\n", image="https://example.com/b.png")
+
+    def assert_renders_as_json_response(self, content):
+        self.assertEqual(render_json(content), JSONResponse(content=jsonable_encoder(content)).body)
+
+    def test_item_page(self):
+        page = ItemPageResponseModel(items=[self.item, self.item.copy(update={'image': None, 'price': 1999.0})],
+                                     next_cursor="abc")
+        self.assert_renders_as_json_response(
+            GenericResponseModel(api_id="id", status_code=http.HTTPStatus.OK, data=page))
+
+    def test_cart(self):
+        cart = CartResponseModel(
+            cart_items=[CartItemResponseModel(original_item=self.item, uuid=uuid.uuid4(), quantity_in_cart=2)],
+            customer=UserResponseModel(first_name="Zoë", last_name="Doe", email="zoe@example.com",
+                                       role=UserRole.CUSTOMER),
+            total_price=21.0)
+        self.assert_renders_as_json_response(GenericResponseModel(status_code=http.HTTPStatus.OK, data=cart))
+
+    def test_constructed_model_and_plain_values(self):
+        self.assert_renders_as_json_response(GenericResponseModel.construct(
+            error="not found", status_code=http.HTTPStatus.NOT_FOUND,
+            data={"at": datetime(2023, 4, 9, 14, 53, 10, 285000, tzinfo=timezone.utc), "ids": [uuid.uuid4()],
+                  "tags": ("a", "b"), 1: None}))
+
+    async def test_build_api_response(self):
+        response = GenericResponseModel(api_id="id", data=[self.item])
+
+        res = await build_api_response(response)
+
+        self.assertEqual(res.status_code, http.HTTPStatus.OK)
+        self.assertEqual(res.body, JSONResponse(content=jsonable_encoder(response)).body)
@@ -0,0 +1,68 @@
+import unittest
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+
+from controller.context_manager import context_actor_user_data
+from utils.exceptions import AuthException
+from utils.jwt_token_handler import JWTHandler, decoded_token_cache
+
+
+class TestDecodedTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        decoded_token_cache.clear()
+        self.addCleanup(decoded_token_cache.clear)
+        self.token = JWTHandler.create_access_token(
+            {"uuid": str(uuid.uuid4()), "role": "customer", "email": "johndoe@example.com"})
+
+    def test_token_is_verified_once(self):
+        JWTHandler.decode_access_token(self.token)
+        first = context_actor_user_data.get()
+        hits = decoded_token_cache.hits
+        with patch('utils.jwt_token_handler.jwt.decode') as mock_decode:
+            JWTHandler.decode_access_token(self.token)
+            mock_decode.assert_not_called()
+
+        self.assertIs(context_actor_user_data.get(), first)
+        self.assertEqual(decoded_token_cache.hits, hits + 1)
+
+    def test_expired_token_is_not_cached(self):
+        token = JWTHandler.create_access_token(
+            {"uuid": str(uuid.uuid4()), "role": "customer", "email": "johndoe@example.com"},
+            expires_delta=timedelta(seconds=-1))
+
+        with self.assertRaises(AuthException):
+            JWTHandler.decode_access_token(token)
+        self.assertEqual(decoded_token_cache.stats()['size'], 0)
+
+    def test_tampered_token_is_rejected(self):
+        JWTHandler.decode_access_token(self.token)
+
+        with self.assertRaises(AuthException):
+            JWTHandler.decode_access_token(self.token[:-2] + "xx")
+
+
+class TestRefreshToken(unittest.TestCase):
+
+    def setUp(self):
+        self.user_uuid = str(uuid.uuid4())
+
+    def test_refresh_token_gives_user_uuid(self):
+        self.assertEqual(JWTHandler.decode_refresh_token(JWTHandler.create_refresh_token(self.user_uuid)),
+                         self.user_uuid)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        with self.assertRaises(AuthException):
+            JWTHandler.decode_access_token(JWTHandler.create_refresh_token(self.user_uuid))
+
+    def test_access_token_is_not_a_refresh_token(self):
+        token = JWTHandler.create_access_token({"uuid": self.user_uuid, "role": "customer",
+                                                "email": "johndoe@example.com"})
+        with self.assertRaises(AuthException):
+            JWTHandler.decode_refresh_token(token)
+
+    def test_expired_refresh_token_is_rejected(self):
+        with self.assertRaises(AuthException):
+            JWTHandler.decode_refresh_token(JWTHandler.create_refresh_token(self.user_uuid,
+                                                                            expires_delta=timedelta(seconds=-1)))
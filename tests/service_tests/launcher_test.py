@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import patch, AsyncMock
+
+from config.settings import Server, DB
+from server import launcher
+from server.launcher import build_options, get_worker_count, get_connections_per_worker, CartServiceApplication, \
+    WORKER_CLASS
+
+
+class TestLauncher(unittest.TestCase):
+
+    def test_configured_worker_count_is_used(self):
+        self.assertEqual(get_worker_count(3), 3)
+
+    @patch.object(Server, 'db_connection_budget', 1000)
+    @patch('server.launcher.os.sched_getaffinity', create=True, return_value={0, 1, 2, 3})
+    def test_one_worker_per_usable_cpu_by_default(self, _):
+        self.assertEqual(get_worker_count(0), 4)
+
+    @patch('server.launcher.os.sched_getaffinity', create=True, return_value=set(range(8)))
+    def test_default_worker_count_fits_in_connection_budget(self, _):
+        with patch.object(Server, 'db_connection_budget', 3 * get_connections_per_worker() + 1), \
+                self.assertLogs(launcher.logger.logger, level='WARNING'):
+            self.assertEqual(get_worker_count(0), 3)
+        with patch.object(Server, 'db_connection_budget', 1):
+            self.assertEqual(get_worker_count(0), 1)
+
+    @patch('server.launcher.os.sched_getaffinity', create=True, return_value={0, 1, 2, 3})
+    def test_default_settings_keep_four_workers(self, _):
+        self.assertEqual(get_worker_count(0), 4)
+
+    @patch.object(DB, 'run_migrations_on_startup', True)
+    @patch.object(launcher, 'CartServiceApplication')
+    @patch.object(launcher.migration, 'main', new_callable=AsyncMock)
+    def test_migrations_run_once_before_forking(self, mock_migrate, mock_application):
+        mock_application.return_value.run.side_effect = lambda: mock_migrate.assert_awaited_once()
+
+        launcher.main()
+
+        mock_application.return_value.run.assert_called_once()
+
+    @patch.object(Server, 'max_requests', 500)
+    @patch.object(Server, 'max_requests_jitter', 50)
+    def test_options_are_valid_gunicorn_settings(self):
+        application = CartServiceApplication(build_options())
+
+        self.assertEqual(application.cfg.max_requests, 500)
+        self.assertEqual(application.cfg.max_requests_jitter, 50)
+        self.assertEqual(application.cfg.worker_class_str, WORKER_CLASS)
+        self.assertEqual(application.cfg.worker_class.CONFIG_KWARGS, {"loop": Server.loop, "http": Server.http})
@@ -0,0 +1,55 @@
+import asyncio
+import http
+import threading
+import unittest
+
+from utils.exceptions import ServiceOverloadedException
+from utils.password_hasher import PasswordHasher, PasswordHashingPool
+
+
+class TestPasswordHashingPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = PasswordHashingPool(workers=1, max_queued=1, queue_timeout_seconds=5)
+        self.addCleanup(self.pool.shutdown)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def blocked_hash(self, password: str) -> str:
+        self.release.wait(5)
+        return password[::-1]
+
+    async def test_hashing_does_not_block_the_loop(self):
+        hashing = asyncio.ensure_future(self.pool.run(PasswordHasher.get_password_hash, "Password123@12"))
+        ticks = 0
+        while not hashing.done():
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+        self.assertTrue(PasswordHasher.verify_password("Password123@12", hashing.result()))
+        self.assertGreater(ticks, 1)
+
+    async def test_full_queue_is_rejected_right_away(self):
+        running = asyncio.ensure_future(self.pool.run(self.blocked_hash, "abc"))
+        queued = asyncio.ensure_future(self.pool.run(self.blocked_hash, "def"))
+        await asyncio.sleep(0.01)
+
+        with self.assertRaises(ServiceOverloadedException) as context:
+            await self.pool.run(self.blocked_hash, "ghi")
+        self.assertEqual(context.exception.status_code, http.HTTPStatus.SERVICE_UNAVAILABLE)
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(running, queued), ["cba", "fed"])
+        self.assertEqual(self.pool.stats()['rejected'], 1)
+
+    async def test_queue_timeout_is_rejected(self):
+        self.pool.queue_timeout_seconds = 0.01
+        running = asyncio.ensure_future(self.pool.run(self.blocked_hash, "abc"))
+        await asyncio.sleep(0.01)
+
+        with self.assertRaises(ServiceOverloadedException):
+            await self.pool.run(self.blocked_hash, "def")
+        self.assertEqual(self.pool.queued, 0)
+
+        self.release.set()
+        self.assertEqual(await running, "cba")
@@ -4,12 +4,15 @@ from unittest.mock import patch, MagicMock
 
 import http
 
-from models.user import UserInsertModel, UserLoginModel, UserModel
+from models.user import UserInsertModel, UserLoginModel, UserModel, RefreshTokenModel, UserStatus
 from service.user_service import UserService
-from utils.password_hasher import PasswordHasher
+from data_adapter.user import User
+from utils.exceptions import AuthException
+from utils.jwt_token_handler import JWTHandler
+from utils.password_hasher import PasswordHasher, build_crypt_context
 
 
-class TestUserService(unittest.TestCase):
+class TestUserService(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.user_insert_data = UserInsertModel(
             first_name="John",
@@ -37,9 +40,9 @@ class TestUserService(unittest.TestCase):
         )
 
     @patch("data_adapter.user.User.create_user")
-    def test_signup_user_success(self, mock_create_user: MagicMock):
+    async def test_signup_user_success(self, mock_create_user: MagicMock):
         mock_create_user.return_value = self.user
-        response = UserService.signup_user(self.user_insert_data)
+        response = await UserService.signup_user(self.user_insert_data)
         self.assertEqual(response.status_code, http.HTTPStatus.CREATED)
         self.assertEqual(response.message, UserService.MSG_USER_CREATED_SUCCESS)
         self.assertEqual(response.data, self.user.build_response_model())
@@ -47,12 +50,12 @@ class TestUserService(unittest.TestCase):
     @patch("data_adapter.user.User.get_active_user_by_email")
     @patch("utils.password_hasher.PasswordHasher.verify_password")
     @patch("utils.jwt_token_handler.JWTHandler.create_access_token")
-    def test_login_user_success(self, mock_create_access_token: MagicMock, mock_verify_password: MagicMock,
-                                mock_get_user_by_email: MagicMock):
+    async def test_login_user_success(self, mock_create_access_token: MagicMock, mock_verify_password: MagicMock,
+                                      mock_get_user_by_email: MagicMock):
         mock_get_user_by_email.return_value = self.user
         mock_verify_password.return_value = True
         mock_create_access_token.return_value = "test_token"
-        response = UserService.login_user(self.user_login_data)
+        response = await UserService.login_user(self.user_login_data)
         self.assertEqual(response.status_code, http.HTTPStatus.OK)
         self.assertEqual(response.message, UserService.MSG_USER_LOGIN_SUCCESS)
         self.assertEqual(response.data.access_token, "test_token")
@@ -61,23 +64,70 @@ class TestUserService(unittest.TestCase):
         self.assertEqual(response.data.user_status, self.user.status)
 
     @patch("data_adapter.user.User.get_active_user_by_email")
-    def test_login_user_failure_user_not_found(self, mock_get_user_by_email: MagicMock):
+    async def test_login_user_failure_user_not_found(self, mock_get_user_by_email: MagicMock):
         mock_get_user_by_email.return_value = None
-        response = UserService.login_user(self.user_login_data)
+        response = await UserService.login_user(self.user_login_data)
         self.assertEqual(response.status_code, http.HTTPStatus.UNAUTHORIZED)
         self.assertEqual(response.error, UserService.ERROR_USER_NOT_FOUND)
 
     @patch("data_adapter.user.User.get_active_user_by_email")
     @patch("utils.password_hasher.PasswordHasher.verify_password")
-    def test_login_user_failure_invalid_credentials(self, mock_verify_password: MagicMock,
-                                                    mock_get_user_by_email: MagicMock):
+    async def test_login_user_failure_invalid_credentials(self, mock_verify_password: MagicMock,
+                                                          mock_get_user_by_email: MagicMock):
         mock_get_user_by_email.return_value = self.user
         mock_verify_password.return_value = False
-        response = UserService.login_user(self.user_login_data)
+        response = await UserService.login_user(self.user_login_data)
         self.assertEqual(response.status_code, http.HTTPStatus.UNAUTHORIZED)
         self.assertEqual(response.error, UserService.ERROR_INVALID_CREDENTIALS)
 
-    def test_user_with_weak_password(self):
+    @patch.object(User, 'update_user_by_uuid')
+    @patch.object(User, 'get_active_user_by_email')
+    async def test_login_rehashes_password_to_current_policy(self, mock_get_user_by_email: MagicMock,
+                                                             mock_update_user_by_uuid: MagicMock):
+        mock_get_user_by_email.return_value = self.user
+        with patch.object(PasswordHasher, 'pwd_context', build_crypt_context(["bcrypt"], rounds=4)):
+            response = await UserService.login_user(self.user_login_data)
+
+            self.assertEqual(response.status_code, http.HTTPStatus.OK)
+            mock_update_user_by_uuid.assert_awaited_once()
+            password_hash = mock_update_user_by_uuid.call_args.kwargs['update_dict'][User.password_hash]
+            self.assertTrue(password_hash.startswith("$2b$04$"))
+            self.assertTrue(PasswordHasher.verify_password("Password123@12", password_hash))
+            self.assertFalse(PasswordHasher.needs_update(password_hash))
+
+    @patch.object(User, 'update_user_by_uuid')
+    @patch.object(User, 'get_active_user_by_email')
+    async def test_login_keeps_password_hash_of_current_policy(self, mock_get_user_by_email: MagicMock,
+                                                               mock_update_user_by_uuid: MagicMock):
+        mock_get_user_by_email.return_value = self.user
+        response = await UserService.login_user(self.user_login_data)
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        mock_update_user_by_uuid.assert_not_awaited()
+
+    @patch.object(User, 'get_by_uuid')
+    async def test_refresh_access_token_success(self, mock_get_by_uuid: MagicMock):
+        mock_get_by_uuid.return_value = self.user
+        refresh_token = JWTHandler.create_refresh_token(self.user.uuid)
+        response = await UserService.refresh_access_token(RefreshTokenModel(refresh_token=refresh_token))
+        self.assertEqual(response.status_code, http.HTTPStatus.OK)
+        self.assertEqual(response.message, UserService.MSG_TOKEN_REFRESH_SUCCESS)
+        self.assertEqual(response.data.refresh_token, refresh_token)
+        JWTHandler.decode_access_token(response.data.access_token)
+        mock_get_by_uuid.assert_awaited_once_with(str(self.user.uuid))
+
+    @patch.object(User, 'get_by_uuid')
+    async def test_refresh_access_token_failure_user_suspended(self, mock_get_by_uuid: MagicMock):
+        mock_get_by_uuid.return_value = self.user.copy(update={'status': UserStatus.SUSPENDED})
+        response = await UserService.refresh_access_token(
+            RefreshTokenModel(refresh_token=JWTHandler.create_refresh_token(self.user.uuid)))
+        self.assertEqual(response.status_code, http.HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response.error, UserService.ERROR_USER_NOT_ACTIVE)
+
+    async def test_refresh_access_token_failure_invalid_token(self):
+        with self.assertRaises(AuthException):
+            await UserService.refresh_access_token(RefreshTokenModel(refresh_token="invalid"))
+
+    async def test_user_with_weak_password(self):
         with self.assertRaises(ValueError):
             UserInsertModel(
                 first_name="John",
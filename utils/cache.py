@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUTTLCache:
+    """
+    in process cache bounded both in size and in age , the least recently used entry is evicted when full and
+    entries older than ttl_seconds are never returned. it is per worker process , entries written by other workers
+    are only picked up once the local entry expires
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float = None):
+        """ttl_seconds shortens the ttl of this entry , it can not extend it past the ttl of the cache"""
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if self.max_size <= 0 or ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries), 'max_size': self.max_size, 'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+class RevocationList:
+    """
+    per worker list of revoked subjects with the time each was revoked , tokens of a subject issued up to then are
+    rejected. an entry is kept for ttl_seconds , the lifetime of the tokens it has to reject , times are unix times
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._revoked_at: Dict[Hashable, float] = {}
+
+    def revoke(self, key: Hashable, revoked_at: float):
+        self._revoked_at[key] = max(revoked_at, self._revoked_at.get(key, revoked_at))
+        # revocations are rare , expired entries are dropped whenever one is added
+        expired_before = time.time() - self.ttl_seconds
+        for expired_key in [key for key, revoked_at in self._revoked_at.items() if revoked_at < expired_before]:
+            del self._revoked_at[expired_key]
+
+    def is_revoked(self, key: Hashable, issued_at: Optional[float]) -> bool:
+        """tokens without an issue time are rejected once their subject is revoked"""
+        revoked_at = self._revoked_at.get(key)
+        if revoked_at is None or revoked_at < time.time() - self.ttl_seconds:
+            return False
+        return issued_at is None or issued_at <= revoked_at
+
+    def clear(self):
+        self._revoked_at.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._revoked_at), 'ttl_seconds': self.ttl_seconds}
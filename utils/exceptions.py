@@ -16,3 +16,15 @@ class AppException(Exception):
 
 class AuthException(AppException):
     pass
+
+
+class ReadOnlySessionException(AppException):
+    pass
+
+
+class ServiceOverloadedException(AppException):
+    pass
+
+
+class MigrationException(AppException):
+    pass
@@ -1,23 +1,39 @@
+import codecs
 import http
+import struct
 import uuid
+import zlib
+from typing import Any, AsyncIterator, Optional
 
+import orjson
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
 
-from controller.context_manager import context_api_id, context_log_meta
+from controller.context_manager import context_api_id, context_log_meta, release_db_session
 from logger import logger
 from models.base import GenericResponseModel
 
 
-def build_api_response(generic_response: GenericResponseModel) -> JSONResponse:
+class ModelJSONResponse(JSONResponse):
+    """JSONResponse rendered straight from the response model , see render_json"""
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+
+async def build_api_response(generic_response: GenericResponseModel, etag: Optional[str] = None) -> JSONResponse:
+    # the service layer is done with the db , release the connection before the response is encoded
+    await release_db_session()
     try:
         if not generic_response.api_id:
             generic_response.api_id = context_api_id.get() if context_api_id.get() else str(uuid.uuid4())
         if not generic_response.status_code:
             generic_response.status_code = http.HTTPStatus.OK if not generic_response.error \
                 else http.HTTPStatus.UNPROCESSABLE_ENTITY
-        response_json = jsonable_encoder(generic_response)
-        res = JSONResponse(status_code=generic_response.status_code, content=response_json)
+        # only successful responses are versioned , errors are never served from a client cache
+        headers = {"ETag": etag} if etag and generic_response.status_code == http.HTTPStatus.OK else None
+        res = ModelJSONResponse(status_code=generic_response.status_code, content=generic_response, headers=headers)
         logger.info(extra=context_log_meta.get(),
                     msg="build_api_response: Generated Response with status_code:"
                         + f"{generic_response.status_code}")
@@ -25,3 +41,81 @@ def build_api_response(generic_response: GenericResponseModel) -> JSONResponse:
     except Exception as e:
         logger.error(extra=context_log_meta.get(), msg=f"exception in build_api_response error : {e}")
         return JSONResponse(status_code=generic_response.status_code, content=generic_response.error)
+
+
+async def build_not_modified_response(etag: str) -> Response:
+    """304 for a conditional GET whose If-None-Match matched , nothing of the resource is read or encoded"""
+    await release_db_session()
+    logger.info(extra=context_log_meta.get(), msg=f"build_not_modified_response: resource not modified {etag}")
+    return Response(status_code=http.HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """weak comparison of the If-None-Match header with the current etag of the resource"""
+    if not if_none_match:
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag == "*" or tag.removeprefix("W/") == opaque_tag
+               for tag in (tag.strip() for tag in if_none_match.split(",")))
+
+
+def _encode_default(obj: Any) -> Any:
+    # models are walked by orjson itself , the response models have no aliases or custom json encoders
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    return jsonable_encoder(obj)
+
+
+def render_json(content: Any) -> bytes:
+    """
+    renders content , models included , to the json jsonable_encoder and JSONResponse would send , in one pass
+    instead of copying every model into a jsonable dict first. uuid , datetime , enum and str subclasses like
+    HttpUrl are encoded natively , anything else falls back to jsonable_encoder
+    """
+    return orjson.dumps(content, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """whether the Accept-Encoding header of the client allows a gzip encoded response"""
+    for coding in (accept_encoding or "").split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if name in ("gzip", "*"):
+            quality = next((param[2:] for param in params if param.startswith("q=")), "1")
+            try:
+                return float(quality) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def deflate_raw(data: bytes, final: bool = True) -> bytes:
+    """
+    raw deflate stream of data from a fresh compressor. a non final stream ends byte aligned , so that a stream
+    deflated independently can follow it
+    """
+    compressor = zlib.compressobj(zlib.Z_BEST_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def gzip_with_deflated_tail(head: bytes, tail: bytes, deflated_tail: bytes) -> bytes:
+    """
+    gzip of head + tail where only the short head is compressed here , the tail was deflated ahead of time with
+    deflate_raw(tail). the tail is still read once for the checksum of the gzip trailer
+    """
+    crc = zlib.crc32(tail, zlib.crc32(head))
+    return b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff" + deflate_raw(head, final=False) + deflated_tail + \
+        struct.pack("<II", crc & 0xffffffff, (len(head) + len(tail)) & 0xffffffff)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """splits a streamed request body into lines without holding more than one chunk and a partial line"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
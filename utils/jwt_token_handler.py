@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import timedelta, datetime
 
 import jwt
@@ -6,10 +8,21 @@ from config.settings import JWTToken
 from controller.context_manager import context_actor_user_data, context_log_meta
 from logger import logger
 from models.user import UserTokenData
+from utils.cache import LRUTTLCache
 from utils.exceptions import AuthException
 
+# verified token data by sha256 digest of the token , every entry expires with its token. no token outlives the
+# configured token lifetime so that is the ttl of the cache
+decoded_token_cache = LRUTTLCache(
+    max_size=JWTToken.decode_cache_size,
+    ttl_seconds=int(JWTToken.access_token_expire_minutes) * 60 if JWTToken.decode_cache_enabled else 0)
+
 
 class JWTHandler:
+    # token_type claim of the tokens , tokens issued before it was added are access tokens
+    ACCESS_TOKEN_TYPE = "access"
+    REFRESH_TOKEN_TYPE = "refresh"
+
     @staticmethod
     def create_access_token(to_encode: dict, expires_delta: timedelta = None):
         """
@@ -18,24 +31,69 @@ class JWTHandler:
         :param expires_delta:
         :return:
         """
+        now = datetime.now()
         if expires_delta:
-            expire = datetime.now() + expires_delta
+            expire = now + expires_delta
         else:
-            expire = datetime.now() + timedelta(minutes=int(JWTToken.access_token_expire_minutes))
-        to_encode.update({"exp": expire.timestamp()})
+            expire = now + timedelta(minutes=int(JWTToken.access_token_expire_minutes))
+        to_encode.update({"exp": expire.timestamp(), "iat": now.timestamp(),
+                          "token_type": JWTHandler.ACCESS_TOKEN_TYPE})
         encoded_jwt = jwt.encode(to_encode, JWTToken.secret, algorithm=JWTToken.algorithm)
         return encoded_jwt
 
+    @staticmethod
+    def create_refresh_token(user_uuid: str, expires_delta: timedelta = None):
+        """
+        Create refresh token for the user , it only carries the user uuid as the user is read again on refresh
+        :param user_uuid:
+        :param expires_delta:
+        :return:
+        """
+        now = datetime.now()
+        expire = now + (expires_delta or timedelta(minutes=JWTToken.refresh_token_expire_minutes))
+        return jwt.encode({"uuid": str(user_uuid), "exp": expire.timestamp(), "iat": now.timestamp(),
+                           "token_type": JWTHandler.REFRESH_TOKEN_TYPE},
+                          JWTToken.secret, algorithm=JWTToken.algorithm)
+
+    @staticmethod
+    def decode_refresh_token(token: str) -> str:
+        """
+        Decode the refresh token
+        :param token:   refresh token
+        :return: uuid of the user the token was issued to
+        :raises AuthException: if the token is not a valid refresh token
+        """
+        try:
+            payload = jwt.decode(token, JWTToken.secret, algorithms=[JWTToken.algorithm])
+            if payload.get("token_type") != JWTHandler.REFRESH_TOKEN_TYPE:
+                raise ValueError("not a refresh token")
+            return payload["uuid"]
+        except Exception as e:
+            logger.error(extra=context_log_meta.get(), msg=f"Error while decoding refresh token: {e}")
+            raise AuthException(status_code=401, message="Invalid refresh token")
+
     @staticmethod
     def decode_access_token(token: str):
         """
-        Decode the access token and set the user data in context
+        Decode the access token and set the user data in context , tokens verified before are served from the
+        decoded token cache until they expire
         :param token:   access token
-        :return:
+        :return: user data of the token
         """
+        token_digest = hashlib.sha256(token.encode()).digest()
+        user_token_data: UserTokenData = decoded_token_cache.get(token_digest)
+        if user_token_data is not None:
+            context_actor_user_data.set(user_token_data)
+            return user_token_data
         try:
             payload = jwt.decode(token, JWTToken.secret, algorithms=[JWTToken.algorithm])
-            context_actor_user_data.set(UserTokenData(**payload))
+            if payload.get("token_type", JWTHandler.ACCESS_TOKEN_TYPE) != JWTHandler.ACCESS_TOKEN_TYPE:
+                raise ValueError("not an access token")
+            user_token_data = UserTokenData(**payload)
+            if payload.get("exp"):
+                decoded_token_cache.set(token_digest, user_token_data, ttl_seconds=payload["exp"] - time.time())
+            context_actor_user_data.set(user_token_data)
+            return user_token_data
         except Exception as e:
             logger.error(extra=context_log_meta.get(), msg=f"Error while decoding access token: {e}")
             raise AuthException(status_code=401, message="Invalid authentication credentials")
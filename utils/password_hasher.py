@@ -1,9 +1,34 @@
+import asyncio
+import http
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
 from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from config.settings import Auth
+from utils.exceptions import ServiceOverloadedException
+
+T = TypeVar("T")
+
+
+def build_crypt_context(schemes: List[str], rounds: int = 0) -> CryptContext:
+    """
+    context hashing with the first scheme , the other schemes are deprecated. with rounds set , hashes of the first
+    scheme with any other rounds need an update as well , so the cost can be lowered as well as raised. without ,
+    only hashes below the passlib default rounds of the scheme need one
+    """
+    if rounds:
+        policy = {f"{schemes[0]}__{key}": rounds for key in ("default_rounds", "min_rounds", "max_rounds")}
+    else:
+        default_rounds = getattr(get_crypt_handler(schemes[0]), "default_rounds", None)
+        policy = {f"{schemes[0]}__min_rounds": default_rounds} if default_rounds else {}
+    return CryptContext(schemes=schemes, deprecated="auto", **policy)
 
 
 class PasswordHasher:
     """utility class to hash and verify passwords"""
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = build_crypt_context(Auth.password_hash_schemes, Auth.password_hash_rounds)
 
     @staticmethod
     def get_password_hash(password: str) -> str:
@@ -12,3 +37,78 @@ class PasswordHasher:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         return PasswordHasher.pwd_context.verify(plain_password, hashed_password)
+
+    @staticmethod
+    def needs_update(hashed_password: str) -> bool:
+        """whether the hash is not of the current scheme and rounds , cheap , nothing is hashed"""
+        return PasswordHasher.pwd_context.needs_update(hashed_password)
+
+
+class PasswordHashingPool:
+    """
+    runs the PasswordHasher calls , hundreds of ms of cpu each , on threads of their own so the event loop keeps
+    serving other requests meanwhile , bcrypt releases the GIL while it hashes.
+    at most `workers` calls run at once and at most `max_queued` more wait , each for up to queue_timeout_seconds.
+    calls beyond that are rejected right away , a login storm gets fast 503s instead of ever growing latency
+    """
+    ERROR_OVERLOADED = "Too many concurrent logins , please retry shortly"
+
+    def __init__(self, workers: int, max_queued: int, queue_timeout_seconds: float):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.queued = 0
+        self.rejected = 0
+        self._executor: ThreadPoolExecutor = None
+        self._semaphore: asyncio.Semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # a semaphore belongs to the loop it is created in
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._semaphore, self._loop = asyncio.Semaphore(self.workers), loop
+        return self._semaphore
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise ServiceOverloadedException(status_code=http.HTTPStatus.SERVICE_UNAVAILABLE,
+                                         message=f"{PasswordHashingPool.ERROR_OVERLOADED} : {reason}")
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        :raises ServiceOverloadedException: if the queue is full or the call waited queue_timeout_seconds for a slot
+        """
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            if self.queued >= self.max_queued:
+                self._reject("queue full")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self._reject("queue timeout")
+            finally:
+                self.queued -= 1
+        else:
+            await semaphore.acquire()
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password_hasher")
+            return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            semaphore.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {'workers': self.workers, 'max_queued': self.max_queued,
+                'queue_timeout_seconds': self.queue_timeout_seconds, 'queued': self.queued, 'rejected': self.rejected}
+
+
+password_hashing_pool = PasswordHashingPool(workers=Auth.password_hash_workers,
+                                            max_queued=Auth.password_hash_max_queued,
+                                            queue_timeout_seconds=Auth.password_hash_queue_timeout_seconds)